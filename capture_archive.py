@@ -0,0 +1,190 @@
+import os
+import json
+import mmap
+import time
+import bisect
+import struct
+import argparse
+
+# 数据文件 <会话>.cset: 文件头 + 依次追加的拍摄组记录
+#   每条记录 = 元数据长度(uint32) + 元数据JSON + 各相机图像数据
+# 索引文件 <会话>.cidx: 每组一个定长条目 (set_id, timestamp_ns, offset, length),
+#   按set_id直接定位, 不需要扫描数据文件
+MAGIC = b"CSET0001"
+RECORD_HEADER = struct.Struct("<I")
+INDEX_ENTRY = struct.Struct("<QqQQ")
+
+
+def session_path(directory=".", name=None):
+    """生成本次会话的分片文件路径(不含扩展名)"""
+    name = name or time.strftime("session_%Y%m%d_%H%M%S")
+    return os.path.join(directory, name)
+
+
+class ArchiveWriter:
+    """顺序追加写入拍摄组, 大块写盘"""
+
+    def __init__(self, path, buffer_size=8 << 20, flush_every=16):
+        self.path = path
+        self.data = open(path + ".cset", "ab", buffering=buffer_size)
+        self.index = open(path + ".cidx", "ab")
+        self.offset = self.data.tell()
+        if self.offset == 0:
+            self.data.write(MAGIC)
+            self.offset = len(MAGIC)
+        self.next_id = self.index.tell() // INDEX_ENTRY.size
+        self.flush_every = flush_every
+        self.pending = []  # 尚未写入索引的条目
+
+    def append(self, images, metadata=None, timestamp_ns=None):
+        """追加一组图像 {相机名: (编码后的bytes, 扩展名)}, 返回set_id"""
+        set_id = self.next_id
+        timestamp_ns = timestamp_ns or time.time_ns()
+
+        entries, position = [], 0
+        for camera, (data, ext) in images.items():
+            entries.append({"camera": camera, "offset": position, "size": len(data), "ext": ext})
+            position += len(data)
+        meta = dict(metadata or {})
+        meta.update({"set_id": set_id, "timestamp_ns": timestamp_ns, "images": entries})
+        header = json.dumps(meta).encode()
+
+        # 图像偏移相对于图像数据区起点
+        self.data.write(RECORD_HEADER.pack(len(header)))
+        self.data.write(header)
+        for data, _ in images.values():
+            self.data.write(data)
+
+        length = RECORD_HEADER.size + len(header) + position
+        self.pending.append(INDEX_ENTRY.pack(set_id, timestamp_ns, self.offset, length))
+        self.offset += length
+        self.next_id += 1
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+        return set_id
+
+    def flush(self):
+        """先落盘数据再写索引, 保证索引不会指向未写完的数据"""
+        self.data.flush()
+        if self.pending:
+            self.index.write(b"".join(self.pending))
+            self.index.flush()
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.data.close()
+        self.index.close()
+
+
+class ArchiveReader:
+    """通过mmap随机读取拍摄组"""
+
+    def __init__(self, path):
+        self.path = path
+        self.data_file = open(path + ".cset", "rb")
+        if os.fstat(self.data_file.fileno()).st_size == 0:
+            # 会话在第一次写盘前就中断了, 文件为空(mmap不能映射长度为0的文件)
+            self.data = b""
+            self.index = b""
+        else:
+            self.data = mmap.mmap(self.data_file.fileno(), 0, access=mmap.ACCESS_READ)
+            if self.data[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path}.cset 不是拍摄组文件")
+            try:
+                with open(path + ".cidx", "rb") as f:
+                    self.index = f.read()
+            except FileNotFoundError:
+                self.index = b""
+        self.count = len(self.index) // INDEX_ENTRY.size
+        self._times = None
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, set_id):
+        """返回 (set_id, timestamp_ns, offset, length)"""
+        if not 0 <= set_id < self.count:
+            raise IndexError(set_id)
+        return INDEX_ENTRY.unpack_from(self.index, set_id * INDEX_ENTRY.size)
+
+    def read_set(self, set_id):
+        """读取一组, 返回 (元数据, {相机名: memoryview}), 图像数据不拷贝"""
+        _, _, offset, _ = self.entry(set_id)
+        (header_len,) = RECORD_HEADER.unpack_from(self.data, offset)
+        start = offset + RECORD_HEADER.size
+        meta = json.loads(self.data[start:start + header_len])
+        base = start + header_len
+        view = memoryview(self.data)
+        images = {img["camera"]: view[base + img["offset"]:base + img["offset"] + img["size"]]
+                  for img in meta["images"]}
+        return meta, images
+
+    def _load_times(self):
+        if self._times is None:
+            entries = list(INDEX_ENTRY.iter_unpack(self.index))
+            self._times = [e[1] for e in entries]
+            self._by_time = {e[1]: e[0] for e in entries}
+            self._ordered = all(a <= b for a, b in zip(self._times, self._times[1:]))
+        return self._times
+
+    def find_by_time(self, timestamp_ns):
+        """按时间戳查找set_id: 完全匹配时直接查表, 否则返回时间上最近的一组
+
+        时间戳是墙上时钟(time_ns), NTP校时可能让它倒退; 只有时间戳有序时才二分查找, 否则逐条比较
+        """
+        times = self._load_times()
+        if not times:
+            return None
+        set_id = self._by_time.get(timestamp_ns)
+        if set_id is not None:
+            return set_id
+        if not self._ordered:
+            return min(range(len(times)), key=lambda j: abs(times[j] - timestamp_ns))
+        i = bisect.bisect_left(times, timestamp_ns)
+        candidates = [j for j in (i - 1, i) if 0 <= j < len(times)]
+        return min(candidates, key=lambda j: abs(times[j] - timestamp_ns))
+
+    def export(self, out_dir, set_ids=None):
+        """导出为单独的图像文件, 文件名带set_id, 同一秒内的多组不会互相覆盖"""
+        os.makedirs(out_dir, exist_ok=True)
+        for set_id in (range(self.count) if set_ids is None else set_ids):
+            meta, images = self.read_set(set_id)
+            stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(meta["timestamp_ns"] / 1e9))
+            exts = {img["camera"]: img["ext"] for img in meta["images"]}
+            for camera, data in images.items():
+                filename = os.path.join(out_dir, f"camera_{camera}_{stamp}_{set_id:06d}{exts[camera]}")
+                with open(filename, "wb") as f:
+                    f.write(data)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="拍摄组分片文件工具")
+    parser.add_argument("path", help="分片路径(不含 .cset/.cidx 扩展名)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="列出所有拍摄组")
+    export = sub.add_parser("export", help="导出为单独的图像文件")
+    export.add_argument("out_dir")
+    export.add_argument("--ids", type=int, nargs="*")
+    args = parser.parse_args()
+
+    reader = ArchiveReader(args.path)
+    if args.command == "list":
+        for set_id in range(len(reader)):
+            meta, images = reader.read_set(set_id)
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["timestamp_ns"] / 1e9))
+            size = sum(len(d) for d in images.values())
+            print(f"{set_id:6d}  {stamp}  {len(images)} 张  {size / 1024:.0f} KB")
+            del images
+    else:
+        reader.export(args.out_dir, args.ids)
+    reader.close()
+
+
+if __name__ == "__main__":
+    main()
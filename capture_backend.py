@@ -0,0 +1,36 @@
+import os
+import cv2
+from replay import get_recorder, RecordingCapture, ReplayCapture, get_session, parse_disconnects
+from v4l2_capture import V4L2Capture
+
+# 通过环境变量选择相机来源:
+#   CAPTURE_RECORD_DIR=dir          正常采集的同时录制原始数据流
+#   CAPTURE_REPLAY_DIR=dir          不连接相机, 回放录制的数据流
+#   CAPTURE_REPLAY_SPEED=1.0        回放速度, 0表示尽可能快
+#   CAPTURE_REPLAY_DISCONNECTS=10:2 在录制时间线第10秒模拟断线2秒, 多段用逗号分隔
+RECORD_DIR = os.environ.get("CAPTURE_RECORD_DIR")
+REPLAY_DIR = os.environ.get("CAPTURE_REPLAY_DIR")
+REPLAY_SPEED = float(os.environ.get("CAPTURE_REPLAY_SPEED", "1.0"))
+REPLAY_DISCONNECTS = parse_disconnects(os.environ.get("CAPTURE_REPLAY_DISCONNECTS"))
+
+
+def open_capture(device_path, standby=False):
+    """打开相机, 返回与cv2.VideoCapture接口相同的对象
+
+    standby为True时优先使用V4L2Capture, 它支持 stream_off()/stream_on() 保持配置的暂停;
+    设备不支持时退回到cv2.VideoCapture, 调用方用 hasattr(cap, 'stream_off') 判断
+    """
+    if REPLAY_DIR:
+        session = get_session(REPLAY_DIR, device_path, REPLAY_SPEED, REPLAY_DISCONNECTS)
+        return ReplayCapture(session)
+
+    cap = None
+    if standby:
+        cap = V4L2Capture(device_path)
+        if not cap.isOpened():
+            cap = None
+    if cap is None:
+        cap = cv2.VideoCapture(device_path)
+    if RECORD_DIR:
+        cap = RecordingCapture(cap, get_recorder(RECORD_DIR, device_path))
+    return cap
@@ -0,0 +1,149 @@
+import time
+import threading
+import cv2
+from capture_backend import open_capture
+from device_watcher import DeviceWatcher, load_camera_list, camera_name, resolve
+from thread_tuning import apply_role
+
+RECONNECT_TIMEOUT = 5.0
+
+
+class CameraWorker(threading.Thread):
+    """持续读取一台相机, 只保留最新一帧及其时间戳, 相机始终保持预热状态"""
+
+    def __init__(self, identity, watcher, resolution=(1280, 720)):
+        super().__init__(daemon=True)
+        self.identity = identity
+        self.name = camera_name(identity)
+        self.resolution = resolution
+        self.device_event = threading.Event()
+        self.device_path = watcher.subscribe(identity, self.on_device_changed) or identity
+        self.running = True
+        self.cap = None
+        self.condition = threading.Condition()
+        self.latest = None
+        self.latest_time = 0.0   # time.monotonic() 时间
+        self.frame_count = 0
+        self.failures = 0
+        self.listeners = []      # 每帧回调 (相机名, 时间戳, 帧)
+
+    def on_device_changed(self, identity, path):
+        if path is not None:
+            self.device_path = path
+            self.device_event.set()
+
+    def _open(self):
+        self.device_event.clear()
+        cap = open_capture(self.device_path)
+        if not cap.isOpened():
+            cap.release()
+            return None
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        return cap
+
+    def _wait_for_device(self):
+        self.failures += 1
+        if self.failures == 1 and resolve(self.identity) is not None:
+            return
+        self.device_event.wait(RECONNECT_TIMEOUT)
+
+    def run(self):
+        apply_role('capture')
+        while self.running:
+            if self.cap is None:
+                self.cap = self._open()
+                if self.cap is None:
+                    print(f"无法打开相机 {self.name} ({self.device_path})")
+                    self._wait_for_device()
+                    continue
+
+            ret, frame = self.cap.read()
+            if not ret:
+                print(f"相机 {self.name} 读取失败")
+                self.cap.release()
+                self.cap = None
+                self._wait_for_device()
+                continue
+
+            self.failures = 0
+            now = time.monotonic()
+            with self.condition:
+                self.latest = frame
+                self.latest_time = now
+                self.frame_count += 1
+                self.condition.notify_all()
+            for listener in self.listeners:
+                listener(self.name, now, frame)
+
+        if self.cap is not None:
+            self.cap.release()
+
+    def wait_for_frame(self, after, timeout):
+        """等待一帧在after之后读到的新图像, 返回 (时间戳, 帧), 超时返回None"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.latest_time <= after:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self.running:
+                    return None
+                self.condition.wait(remaining)
+            return self.latest_time, self.latest
+
+    def stop(self):
+        self.running = False
+        self.device_event.set()
+        with self.condition:
+            self.condition.notify_all()
+
+
+class CaptureEngine:
+    """无界面的多相机采集引擎: 所有相机常开, 拍照时直接取触发后的第一帧"""
+
+    def __init__(self, identities=None, resolution=(1280, 720)):
+        self.watcher = DeviceWatcher()
+        self.workers = [CameraWorker(identity, self.watcher, resolution)
+                        for identity in (identities or load_camera_list())]
+
+    @property
+    def camera_names(self):
+        return [w.name for w in self.workers]
+
+    def start(self):
+        self.watcher.start()
+        for worker in self.workers:
+            worker.start()
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+        for worker in self.workers:
+            worker.join()
+        self.watcher.stop()
+
+    def add_listener(self, callback):
+        """注册每帧回调 callback(相机名, 时间戳, 帧), 在各相机的读取线程中调用"""
+        for worker in self.workers:
+            worker.listeners.append(callback)
+
+    def capture_set(self, trigger=None, timeout=1.0):
+        """取每台相机在trigger之后的第一帧, 返回 ({相机名: 帧}, 元数据)
+
+        timeout是整组的等待时间, 多台相机缺帧时也不会超过
+        """
+        trigger = time.monotonic() if trigger is None else trigger
+        deadline = time.monotonic() + timeout
+        frames, times, missing = {}, {}, []
+        for worker in self.workers:
+            result = worker.wait_for_frame(trigger, max(0.0, deadline - time.monotonic()))
+            if result is None:
+                missing.append(worker.name)
+            else:
+                times[worker.name], frames[worker.name] = result
+        metadata = {
+            'trigger': trigger,
+            'capture_times': times,
+            'skew': max(times.values()) - min(times.values()) if times else 0.0,
+            'missing': missing,
+        }
+        return frames, metadata
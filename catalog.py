@@ -0,0 +1,220 @@
+import re
+import json
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+from thread_tuning import apply_role
+
+CATALOG_PATH = "captures.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS capture_sets (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    status TEXT NOT NULL,
+    camera_count INTEGER NOT NULL,
+    failed_count INTEGER NOT NULL,
+    skew REAL,
+    duration REAL,
+    settings TEXT
+);
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY,
+    set_id INTEGER NOT NULL REFERENCES capture_sets(id),
+    time REAL NOT NULL,
+    camera TEXT NOT NULL,
+    status TEXT NOT NULL,
+    file TEXT,
+    size INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sets_time ON capture_sets(time);
+CREATE INDEX IF NOT EXISTS idx_sets_status_time ON capture_sets(status, time);
+CREATE INDEX IF NOT EXISTS idx_captures_time ON captures(time);
+CREATE INDEX IF NOT EXISTS idx_captures_camera_time ON captures(camera, time);
+CREATE INDEX IF NOT EXISTS idx_captures_status_time ON captures(status, time);
+CREATE INDEX IF NOT EXISTS idx_captures_set ON captures(set_id);
+"""
+
+
+def connect(path=CATALOG_PATH):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+class CaptureCatalog:
+    """拍摄记录数据库: 采集线程只把记录放进队列, 后台线程批量事务写入"""
+
+    def __init__(self, path=CATALOG_PATH, batch_size=256):
+        self.path = path
+        self.batch_size = batch_size
+        with connect(path) as conn:
+            conn.executescript(SCHEMA)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self._writer, daemon=True)
+        self.thread.start()
+
+    def register_set(self, set_time, results, sizes=None, metadata=None, duration=None):
+        """登记一组拍摄结果 [(相机名, 文件, 是否成功), ...], 立即返回"""
+        metadata = dict(metadata or {})
+        sizes = sizes or {}
+        captures = [(camera, 'ok' if ok else 'failed', location,
+                     sizes.get(camera), None if ok else 'save failed')
+                    for camera, location, ok in results]
+        # 读取失败、根本没有拿到图像的相机
+        for camera in metadata.pop('missing', []):
+            captures.append((camera, 'failed', None, None, 'read failed'))
+
+        failed = sum(1 for c in captures if c[1] == 'failed')
+        if failed == 0:
+            status = 'ok'
+        elif failed == len(captures):
+            status = 'failed'
+        else:
+            status = 'partial'
+        row = (set_time, status, len(captures), failed, metadata.get('skew'), duration,
+               json.dumps(metadata, default=str))
+        self.queue.put((row, captures))
+
+    def _writer(self):
+        apply_role('background')
+        conn = connect(self.path)
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [item for item in batch if item is not None]
+            try:
+                with conn:
+                    for row, captures in batch:
+                        cur = conn.execute(
+                            "INSERT INTO capture_sets (time, status, camera_count, failed_count,"
+                            " skew, duration, settings) VALUES (?, ?, ?, ?, ?, ?, ?)", row)
+                        conn.executemany(
+                            "INSERT INTO captures (set_id, time, camera, status, file, size, error)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            [(cur.lastrowid, row[0]) + c for c in captures])
+            except sqlite3.Error as e:
+                print(f"写入拍摄记录失败: {e}")
+        conn.close()
+
+    def close(self):
+        """写完队列中剩余的记录后退出"""
+        self.queue.put(None)
+        self.thread.join()
+
+
+def query_captures(conn, start=None, end=None, camera=None, status=None, limit=None):
+    """按时间范围、相机、状态查询单张图像记录"""
+    sql = "SELECT * FROM captures WHERE 1=1"
+    params = []
+    if start is not None:
+        sql += " AND time >= ?"
+        params.append(start)
+    if end is not None:
+        sql += " AND time < ?"
+        params.append(end)
+    if camera is not None:
+        sql += " AND camera = ?"
+        params.append(camera)
+    if status is not None:
+        sql += " AND status = ?"
+        params.append(status)
+    sql += " ORDER BY time"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def query_sets(conn, start=None, end=None, status=None, limit=None):
+    """按时间范围、状态查询拍摄组"""
+    sql = "SELECT * FROM capture_sets WHERE 1=1"
+    params = []
+    if start is not None:
+        sql += " AND time >= ?"
+        params.append(start)
+    if end is not None:
+        sql += " AND time < ?"
+        params.append(end)
+    if status is not None:
+        sql += " AND status = ?"
+        params.append(status)
+    sql += " ORDER BY time"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def parse_time(text):
+    """解析时间参数: 7d / 12h / 30m 表示距今, 或者 2024-01-01 [12:00]"""
+    if text is None:
+        return None
+    match = re.fullmatch(r"(\d+)([dhm])", text)
+    if match:
+        seconds = int(match.group(1)) * {'d': 86400, 'h': 3600, 'm': 60}[match.group(2)]
+        return time.time() - seconds
+    for fmt in ("%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"无法解析时间: {text}")
+
+
+def format_time(t):
+    return datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查询拍摄记录")
+    parser.add_argument("--db", default=CATALOG_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("captures", "查询单张图像"), ("sets", "查询拍摄组")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--since", type=parse_time, help="例如 7d, 12h, 2024-01-01")
+        p.add_argument("--until", type=parse_time)
+        p.add_argument("--status", choices=["ok", "failed", "partial"])
+        p.add_argument("--limit", type=int)
+        if name == "captures":
+            p.add_argument("--camera")
+    sub.add_parser("stats", help="按相机统计成功/失败次数")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    start = time.perf_counter()
+    if args.command == "captures":
+        rows = query_captures(conn, args.since, args.until, args.camera, args.status, args.limit)
+        for r in rows:
+            print(f"{format_time(r['time'])}  set={r['set_id']:<6} {r['camera']:<8} "
+                  f"{r['status']:<7} {r['size'] or '-':>9}  {r['file'] or r['error']}")
+    elif args.command == "sets":
+        rows = query_sets(conn, args.since, args.until, args.status, args.limit)
+        for r in rows:
+            skew = f"{r['skew'] * 1000:.1f}ms" if r['skew'] is not None else "-"
+            print(f"{format_time(r['time'])}  set={r['id']:<6} {r['status']:<7} "
+                  f"{r['camera_count'] - r['failed_count']}/{r['camera_count']}  skew={skew}")
+    else:
+        rows = conn.execute("SELECT camera, status, COUNT(*) AS n FROM captures "
+                            "GROUP BY camera, status ORDER BY camera").fetchall()
+        for r in rows:
+            print(f"{r['camera']:<8} {r['status']:<7} {r['n']}")
+    print(f"共 {len(rows)} 条, 查询耗时 {(time.perf_counter() - start) * 1000:.1f} ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import os
+import json
+import argparse
+import cv2
+import numpy as np
+
+# 布局文件示例:
+# {"canvas": [1920, 720], "source_size": [640, 360],
+#  "tiles": [{"camera": "video0", "rect": [0, 0, 640, 360]},
+#            {"camera": "video2", "homography": [[...], [...], [...]], "feather": 40,
+#             "mask": "masks/video2.png"}]}
+# rect 为平铺位置 (x, y, w, h); homography 为源图到画布的3x3单应矩阵;
+# feather 为边缘羽化宽度(像素), mask 为源图坐标下的灰度融合掩码
+
+
+def grid_layout(camera_names, tile_size=(640, 360), cols=3):
+    """生成简单的平铺(缩略图墙)布局"""
+    tw, th = tile_size
+    rows = (len(camera_names) + cols - 1) // cols
+    tiles = [{"camera": name, "rect": [(i % cols) * tw, (i // cols) * th, tw, th]}
+             for i, name in enumerate(camera_names)]
+    return {"canvas": [cols * tw, rows * th], "source_size": [tw, th], "tiles": tiles}
+
+
+def load_layout(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+class Compositor:
+    """预先计算查找表, 每组图像只需一次 np.take 即可合成拼接图"""
+
+    def __init__(self, layout):
+        self.camera_names = [t["camera"] for t in layout["tiles"]]
+        self.canvas_w, self.canvas_h = layout["canvas"]
+        self.src_w, self.src_h = layout["source_size"]
+        count = len(self.camera_names)
+
+        # 所有源图放在同一个缓冲区, 末尾多一个黑色像素给画布空白处
+        self.stack = np.zeros((count * self.src_h * self.src_w + 1, 3), dtype=np.uint8)
+        self.sources = self.stack[:-1].reshape(count, self.src_h, self.src_w, 3)
+        self.output = np.empty((self.canvas_h, self.canvas_w, 3), dtype=np.uint8)
+        self._build_tables(layout)
+
+    def _tile_weights(self, tile, xs, ys):
+        """计算某个图块对画布每个像素的源索引和权重"""
+        if "rect" in tile:
+            rx, ry, rw, rh = tile["rect"]
+            sx = (xs - rx) * (self.src_w / rw)
+            sy = (ys - ry) * (self.src_h / rh)
+        else:
+            inv = np.linalg.inv(np.array(tile["homography"], dtype=np.float64))
+            pts = inv @ np.stack([xs, ys, np.ones_like(xs)])
+            sx = pts[0] / pts[2]
+            sy = pts[1] / pts[2]
+
+        valid = (sx >= 0) & (sx < self.src_w) & (sy >= 0) & (sy < self.src_h)
+        ix = np.clip(sx, 0, self.src_w - 1).astype(np.int64)
+        iy = np.clip(sy, 0, self.src_h - 1).astype(np.int64)
+
+        weight = valid.astype(np.float32)
+        feather = tile.get("feather", 0)
+        if feather > 0:
+            edge = np.minimum(np.minimum(ix, self.src_w - 1 - ix),
+                              np.minimum(iy, self.src_h - 1 - iy))
+            weight *= np.clip((edge + 1) / feather, 0, 1)
+        if tile.get("mask"):
+            mask = cv2.imread(tile["mask"], cv2.IMREAD_GRAYSCALE)
+            mask = cv2.resize(mask, (self.src_w, self.src_h))
+            weight *= mask[iy, ix] / 255.0
+        return iy * self.src_w + ix, weight
+
+    def _build_tables(self, layout):
+        ys, xs = np.mgrid[0:self.canvas_h, 0:self.canvas_w]
+        xs = xs.ravel().astype(np.float64) + 0.5
+        ys = ys.ravel().astype(np.float64) + 0.5
+        tile_pixels = self.src_w * self.src_h
+
+        indices, weights = [], []
+        for i, tile in enumerate(layout["tiles"]):
+            index, weight = self._tile_weights(tile, xs, ys)
+            indices.append(index + i * tile_pixels)
+            weights.append(weight)
+        indices = np.stack(indices)
+        weights = np.stack(weights)
+
+        # 每个画布像素只保留权重最大的两个图块
+        order = np.argsort(-weights, axis=0)
+        pixel = np.arange(weights.shape[1])
+        first, second = order[0], order[min(1, len(order) - 1)]
+        w0 = weights[first, pixel]
+        w1 = weights[second, pixel] if len(order) > 1 else np.zeros_like(w0)
+        blank = len(self.stack) - 1
+
+        self.index0 = np.where(w0 > 0, indices[first, pixel], blank)
+        # 只有两个图块都有权重的像素需要融合, 其余像素直接查表拷贝
+        overlap = (w0 > 0) & (w1 > 0)
+        self.blend_pixels = np.nonzero(overlap)[0]
+        total = w0 + w1
+        total[total == 0] = 1
+        self.blend_index0 = self.index0[self.blend_pixels]
+        self.blend_index1 = np.where(w1 > 0, indices[second, pixel], blank)[self.blend_pixels]
+        self.blend_w0 = (w0 / total)[self.blend_pixels, None].astype(np.float32)
+        self.blend_w1 = (w1 / total)[self.blend_pixels, None].astype(np.float32)
+
+    def compose(self, frames):
+        """合成一组图像 {相机名: 帧}, 缺少的相机显示为黑色"""
+        for i, name in enumerate(self.camera_names):
+            frame = frames.get(name)
+            if frame is None:
+                self.sources[i] = 0
+            elif frame.shape[:2] == (self.src_h, self.src_w):
+                self.sources[i] = frame
+            else:
+                cv2.resize(frame, (self.src_w, self.src_h), dst=self.sources[i],
+                           interpolation=cv2.INTER_AREA)
+
+        out = self.output.reshape(-1, 3)
+        np.take(self.stack, self.index0, axis=0, out=out)
+        if len(self.blend_pixels):
+            blended = (self.stack[self.blend_index0] * self.blend_w0 +
+                       self.stack[self.blend_index1] * self.blend_w1)
+            out[self.blend_pixels] = blended.astype(np.uint8)
+        return self.output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把一组相机图像合成为拼接图/缩略图墙")
+    parser.add_argument("timestamp", help="保存时的时间戳, 例如 20240101_120000")
+    parser.add_argument("--layout", help="布局文件, 不指定时按3列平铺")
+    parser.add_argument("--dir", default=".")
+    parser.add_argument("-o", "--output", help="输出文件名")
+    args = parser.parse_args()
+
+    prefix, suffix = "camera_", f"_{args.timestamp}.jpg"
+    frames = {}
+    for filename in sorted(os.listdir(args.dir)):
+        if filename.startswith(prefix) and filename.endswith(suffix):
+            frames[filename[len(prefix):-len(suffix)]] = cv2.imread(os.path.join(args.dir, filename))
+    if not frames:
+        print(f"没有找到时间戳为 {args.timestamp} 的图像")
+        return
+
+    layout = load_layout(args.layout) if args.layout else grid_layout(list(frames))
+    output = args.output or os.path.join(args.dir, f"composite_{args.timestamp}.jpg")
+    cv2.imwrite(output, Compositor(layout).compose(frames))
+    print(f"已保存 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,45 @@
+import os
 import cv2
 import time
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, wait
+from concurrent.futures import ThreadPoolExecutor
+from focus import read_sharpest, log_sharpness
+from save_pipeline import SavePipeline, make_timestamp
+from flatfield import FlatFieldCorrector, FLATFIELD_DIR
+from roi import load_rois
+from catalog import CaptureCatalog
+from capture_backend import open_capture
+from encoders import get_encoder
+from frame_budget import default_budget
+from startup_profile import profiler
+from thread_tuning import apply_role
 
-def save_single_camera(camera_id, timestamp, main_cap=None):
-    """单个相机保存图片的函数"""
+# 每台相机读取的候选帧数, 只保存其中最清晰的一帧
+SHARPEST_OF_N = 5
+
+# 存在平场校正图目录时, 保存前对整组图像做亮度/渐晕校正
+FLAT_FIELD_CORRECTION = os.path.isdir(FLATFIELD_DIR)
+
+# 为True时每组图像追加到本次会话的分片文件, 而不是保存为单独的jpg
+ARCHIVE_CAPTURES = False
+
+# 保存格式和压缩参数, 见 encoders.py
+SAVE_ENCODER = get_encoder('jpeg', quality=95)
+
+def grab_single_camera(camera_id, main_cap=None):
+    """从单个相机读取最清晰的一帧, 返回 (帧, 清晰度, 拍摄信息), 失败返回None"""
     try:
         if camera_id == 0 and main_cap is not None:
-            print(f"保存摄像头 {camera_id} 的图片...")
-            ret, frame = main_cap.read()
-            if ret:
-                filename = f"camera_{camera_id}_{timestamp}.jpg"
-                cv2.imwrite(filename, frame)
-                print(f"已保存 {filename}")
-                return True
-            return False
-
-        print(f"保存摄像头 {camera_id} 的图片...")
-        cap = cv2.VideoCapture(f'/dev/video{camera_id}')
+            print(f"读取摄像头 {camera_id} 的图片...")
+            ret, frame, score = read_sharpest(main_cap, SHARPEST_OF_N, budget=default_budget(),
+                                              camera=str(camera_id))
+            info = {'time': time.time(), 'exposure': main_cap.get(cv2.CAP_PROP_EXPOSURE)}
+            return (frame, score, info) if ret else None
+
+        print(f"读取摄像头 {camera_id} 的图片...")
+        cap = open_capture(f'/dev/video{camera_id}')
         if not cap.isOpened():
             print(f"无法打开摄像头 {camera_id}")
-            return False
+            return None
 
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
@@ -28,54 +47,94 @@ def save_single_camera(camera_id, timestamp, main_cap=None):
         for _ in range(5):
             cap.read()
 
-        ret, frame = cap.read()
-        if ret:
-            filename = f"camera_{camera_id}_{timestamp}.jpg"
-            cv2.imwrite(filename, frame)
-            print(f"已保存 {filename}")
-            success = True
-        else:
-            print(f"无法从摄像头 {camera_id} 读取图像")
-            success = False
-
+        ret, frame, score = read_sharpest(cap, SHARPEST_OF_N, budget=default_budget(), camera=str(camera_id))
+        info = {'time': time.time(), 'exposure': cap.get(cv2.CAP_PROP_EXPOSURE)}
         cap.release()
-        return success
+        if not ret:
+            print(f"无法从摄像头 {camera_id} 读取图像")
+            return None
+        return frame, score, info
 
     except Exception as e:
-        print(f"保存摄像头 {camera_id} 图片时出错: {e}")
-        return False
+        print(f"读取摄像头 {camera_id} 图片时出错: {e}")
+        return None
 
-def save_all_cameras(main_cap):
-    """同时保存所有相机的图片"""
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+def save_all_cameras(main_cap, pipeline, correction=None):
+    """同时读取所有相机, 整组校正后通过保存管线写盘"""
+    timestamp = make_timestamp()
     camera_ids = [0, 2, 4, 6, 8, 10]
     
-    with ThreadPoolExecutor(max_workers=len(camera_ids)) as executor:
-        future_to_camera = {
-            executor.submit(save_single_camera, 
-                          camera_id, 
-                          timestamp,
-                          main_cap if camera_id == 0 else None): camera_id
+    with ThreadPoolExecutor(max_workers=len(camera_ids), initializer=apply_role, initargs=('capture',)) as executor:
+        futures = {
+            camera_id: executor.submit(grab_single_camera,
+                                       camera_id,
+                                       main_cap if camera_id == 0 else None)
             for camera_id in camera_ids
         }
-        wait(future_to_camera.keys())
+    
+    frames, scores, infos = {}, {}, {}
+    for camera_id, future in futures.items():
+        result = future.result()
+        if result is not None:
+            frames[str(camera_id)], scores[str(camera_id)], infos[str(camera_id)] = result
+    
+    times = [info['time'] for info in infos.values()]
+    metadata = {
+        'capture_times': {name: info['time'] for name, info in infos.items()},
+        'exposure': {name: info['exposure'] for name, info in infos.items()},
+        'sharpness': scores,
+        'skew': max(times) - min(times) if times else 0.0,
+        'missing': [str(c) for c in camera_ids if str(c) not in frames],
+    }
+    
+    future = pipeline.submit_set(frames, timestamp, correction, metadata)
+    # 保存队列已为这组帧申请了 'save' 预算, 连拍时占用的 'burst' 预算可以退还
+    budget = default_budget()
+    for name, frame in frames.items():
+        budget.release('burst', name, frame.nbytes)
+    results = future.result()
+    for name, filename, ok in results:
+        if ok:
+            log_sharpness(filename, scores[name])
+            print(f"已保存 {filename} (清晰度 {scores[name]:.1f})")
+        else:
+            print(f"保存 {filename} 失败")
 
 def main():
+    profiler.mark_imports()
     # 打开主显示用的摄像头
-    main_cap = cv2.VideoCapture('/dev/video0')
+    with profiler.phase('video0', 'open'):
+        main_cap = open_capture('/dev/video0')
     if not main_cap.isOpened():
         print("无法打开主摄像头")
         return
 
     # 设置采集分辨率
-    main_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
-    main_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    with profiler.phase('video0', 'format'):
+        main_cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)
+        main_cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+    with profiler.phase('video0', 'first_frame'):
+        main_cap.grab()
+    profiler.report()
     
     # 设置显示窗口名称和大小
     window_name = 'Camera'
     cv2.namedWindow(window_name, cv2.WINDOW_NORMAL)
     cv2.resizeWindow(window_name, 640, 480)  # 设置显示窗口大小
 
+    # ROI配置以设备名(video0)为键, 这里换成本程序使用的相机编号; 其他形式的键(by-id名称等)保持不变
+    rois = {name[len('video'):] if name.startswith('video') else name: roi for name, roi in load_rois().items()}
+    archive = None
+    if ARCHIVE_CAPTURES:
+        # 只有写分片文件时才需要
+        from capture_archive import ArchiveWriter, session_path
+        archive = ArchiveWriter(session_path(), flush_every=1)
+    pipeline = SavePipeline(rois=rois, archive=archive, catalog=CaptureCatalog(), encoder=SAVE_ENCODER,
+                            budget=default_budget())
+    correction = None
+    if FLAT_FIELD_CORRECTION:
+        correction = FlatFieldCorrector(['0', '2', '4', '6', '8', '10'])
+
     print("程序已启动:")
     print("按's'键同时保存所有摄像头的图片")
     print("按'q'键退出程序")
@@ -90,12 +149,13 @@ def main():
         key = cv2.waitKey(1) & 0xFF
         if key == ord('s'):
             print("\n开始保存图片...")
-            save_all_cameras(main_cap)
+            save_all_cameras(main_cap, pipeline, correction)
             print("保存完成\n")
         elif key == ord('q'):
             break
 
     main_cap.release()
+    pipeline.close()
     cv2.destroyAllWindows()
 
 if __name__ == "__main__":
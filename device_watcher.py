@@ -0,0 +1,137 @@
+import os
+import json
+import errno
+import select
+import ctypes
+import ctypes.util
+import threading
+from thread_tuning import apply_role
+
+# 相机列表配置: cameras.json 中按顺序列出每台相机的稳定标识, 例如
+# ["/dev/v4l/by-path/pci-0000:00:14.0-usb-0:1:1.0-video-index0", ...]
+# USB复位后 /dev/videoN 的编号可能改变, by-path(按USB端口) 或 by-id(按序列号) 不会
+CAMERA_CONFIG = "cameras.json"
+DEFAULT_CAMERAS = ['/dev/video0', '/dev/video2', '/dev/video4',
+                   '/dev/video6', '/dev/video8', '/dev/video10']
+V4L_DIRS = ['/dev', '/dev/v4l/by-path', '/dev/v4l/by-id']
+
+IN_ATTRIB = 0x00000004
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+
+def load_camera_list(path=CAMERA_CONFIG):
+    """读取相机标识列表, 没有配置文件时使用默认的 /dev/videoN 列表"""
+    if not os.path.exists(path):
+        return list(DEFAULT_CAMERAS)
+    try:
+        with open(path) as f:
+            return list(json.load(f))
+    except (OSError, ValueError) as e:
+        print(f"读取相机列表失败 {path}: {e}")
+        return list(DEFAULT_CAMERAS)
+
+
+def camera_name(identity):
+    """相机的显示/文件名, 不随 /dev/videoN 编号变化"""
+    return identity.split('/')[-1]
+
+
+def resolve(identity):
+    """把稳定标识解析为当前的设备节点, 设备不存在时返回None"""
+    path = os.path.realpath(identity)
+    return path if os.path.exists(path) else None
+
+
+class DeviceWatcher:
+    """监视 /dev 下视频设备的出现和消失(inotify), 通知订阅的采集线程"""
+
+    def __init__(self):
+        self.subscribers = {}  # 标识 -> [回调(标识, 设备节点或None)]
+        self.current = {}      # 标识 -> 当前设备节点
+        self.lock = threading.Lock()
+        self.running = False
+        self.wake_r, self.wake_w = os.pipe()
+        self.fd = self._init_inotify()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def _init_inotify(self):
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1")
+            self.libc = libc
+            self._add_watches(fd)
+            return fd
+        except (OSError, AttributeError) as e:
+            # 没有inotify时退回到定时扫描
+            print(f"inotify不可用, 改为定时扫描设备: {e}")
+            return None
+
+    def _add_watches(self, fd):
+        """监视已存在的设备目录; by-path/by-id 目录可能在第一台相机插入后才出现, 每次事件后重新添加"""
+        mask = IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MOVED_TO
+        for directory in V4L_DIRS:
+            if os.path.isdir(directory):
+                self.libc.inotify_add_watch(fd, directory.encode(), mask)
+
+    def subscribe(self, identity, callback):
+        with self.lock:
+            self.subscribers.setdefault(identity, []).append(callback)
+            self.current[identity] = resolve(identity)
+        return self.current[identity]
+
+    def start(self):
+        self.running = True
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        os.write(self.wake_w, b"x")
+        self.thread.join()
+
+    def rescan(self, notify_present=False):
+        """重新解析所有标识, 对发生变化的相机发出通知
+
+        notify_present为True时, 所有当前存在的设备也会收到通知(设备节点权限刚设置好时
+        路径没有变化, 但之前打开失败的线程可以重试了)
+        """
+        changes = []
+        with self.lock:
+            for identity in self.subscribers:
+                path = resolve(identity)
+                if path != self.current.get(identity) or (notify_present and path is not None):
+                    self.current[identity] = path
+                    changes.append((identity, path))
+        for identity, path in changes:
+            for callback in self.subscribers[identity]:
+                callback(identity, path)
+
+    def _drain(self):
+        while True:
+            try:
+                if not os.read(self.fd, 4096):
+                    break
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+
+    def _run(self):
+        apply_role('background')
+        fds = [self.wake_r] + ([self.fd] if self.fd is not None else [])
+        while self.running:
+            # inotify只负责唤醒, 具体变化由rescan确定; 超时兜底处理by-path目录晚于设备创建的情况
+            ready, _, _ = select.select(fds, [], [], 0.5 if self.fd is None else 2.0)
+            if not self.running:
+                break
+            if self.fd in ready:
+                self._drain()
+                self._add_watches(self.fd)
+                self.rescan(notify_present=True)
+            else:
+                self.rescan()
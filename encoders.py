@@ -0,0 +1,197 @@
+import io
+import os
+import time
+import argparse
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+# PyTurboJPEG是可选依赖, 没有安装时 'turbojpeg' 编码器不可用
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_444, TJSAMP_422, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+SUBSAMPLING = ('444', '422', '420')
+
+
+class Encoder(ABC):
+    """把一帧BGR图像编码为文件数据"""
+    name = None
+    ext = None
+
+    @abstractmethod
+    def encode(self, frame):
+        """返回编码后的bytes, 失败返回None"""
+
+    def save(self, filename, frame):
+        data = self.encode(frame)
+        if data is None:
+            return False
+        with open(filename, "wb") as f:
+            f.write(data)
+        return True
+
+
+class CvJpegEncoder(Encoder):
+    """cv2.imencode JPEG; 默认参数与 cv2.imwrite 相同(质量95, 4:2:0)"""
+    name = 'jpeg'
+    ext = '.jpg'
+
+    def __init__(self, quality=95, subsampling='420', optimize=False):
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, int(optimize)]
+        # 色度抽样参数在OpenCV 4.5.5之后才有
+        factor = getattr(cv2, f"IMWRITE_JPEG_SAMPLING_FACTOR_{subsampling}", None)
+        if factor is not None and hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR"):
+            self.params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, factor]
+
+    def encode(self, frame):
+        ok, data = cv2.imencode(self.ext, frame, self.params)
+        return data.tobytes() if ok else None
+
+
+class TurboJpegEncoder(Encoder):
+    """libjpeg-turbo (PyTurboJPEG)"""
+    name = 'turbojpeg'
+    ext = '.jpg'
+
+    def __init__(self, quality=95, subsampling='420'):
+        if TurboJPEG is None:
+            raise RuntimeError("未安装PyTurboJPEG (pip install PyTurboJPEG)")
+        self.jpeg = TurboJPEG()
+        self.quality = quality
+        self.subsampling = {'444': TJSAMP_444, '422': TJSAMP_422, '420': TJSAMP_420}[subsampling]
+
+    def encode(self, frame):
+        try:
+            return self.jpeg.encode(frame, quality=self.quality, jpeg_subsample=self.subsampling)
+        except OSError as e:
+            print(f"JPEG编码失败: {e}")
+            return None
+
+
+class PngEncoder(Encoder):
+    name = 'png'
+    ext = '.png'
+
+    def __init__(self, compression=3):
+        self.params = [cv2.IMWRITE_PNG_COMPRESSION, compression]
+
+    def encode(self, frame):
+        ok, data = cv2.imencode(self.ext, frame, self.params)
+        return data.tobytes() if ok else None
+
+
+class WebpEncoder(Encoder):
+    name = 'webp'
+    ext = '.webp'
+
+    def __init__(self, quality=90):
+        # 质量大于100时为无损
+        self.params = [cv2.IMWRITE_WEBP_QUALITY, quality]
+
+    def encode(self, frame):
+        ok, data = cv2.imencode(self.ext, frame, self.params)
+        return data.tobytes() if ok else None
+
+
+class NpyEncoder(Encoder):
+    """不压缩的原始数组, 用 np.load 读取"""
+    name = 'npy'
+    ext = '.npy'
+
+    def encode(self, frame):
+        buffer = io.BytesIO()
+        np.save(buffer, frame, allow_pickle=False)
+        return buffer.getvalue()
+
+
+ENCODERS = {cls.name: cls for cls in (CvJpegEncoder, TurboJpegEncoder, PngEncoder, WebpEncoder, NpyEncoder)}
+
+
+def available_encoders():
+    return [name for name in ENCODERS if name != 'turbojpeg' or TurboJPEG is not None]
+
+
+def get_encoder(name='jpeg', **options):
+    """按名称创建编码器, options为该编码器支持的参数(quality, subsampling, compression等)"""
+    if name not in ENCODERS:
+        raise ValueError(f"未知的编码器 {name}, 可选: {', '.join(ENCODERS)}")
+    return ENCODERS[name](**options)
+
+
+def encode_set(encoder, frames, pool):
+    """在线程池中并行编码一组帧 {相机名: 帧}, 返回 {相机名: bytes或None}
+
+    cv2.imencode和libjpeg-turbo编码时都会释放GIL, 多线程可以用满多个核
+    """
+    futures = {name: pool.submit(encoder.encode, frame) for name, frame in frames.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def benchmark(encoder, frames, threads, repeat):
+    """对一组帧重复编码, 返回吞吐(MB/s, 按原始图像大小)、每帧耗时和平均文件大小"""
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        encode_set(encoder, frames, pool)  # 预热
+        sizes = []
+        start = time.perf_counter()
+        for _ in range(repeat):
+            sizes.extend(len(data) for data in encode_set(encoder, frames, pool).values() if data)
+        elapsed = time.perf_counter() - start
+    count = repeat * len(frames)
+    raw_bytes = sum(f.nbytes for f in frames.values()) * repeat
+    return {
+        'mb_per_s': raw_bytes / elapsed / 1e6,
+        'ms_per_frame': elapsed / count * 1000,
+        'bytes_per_frame': sum(sizes) / len(sizes) if sizes else 0,
+    }
+
+
+def load_benchmark_frames(paths, count=6):
+    """读取实际拍摄的图片作为测试帧, 没有给出时从相机各取一帧"""
+    if paths:
+        frames = {os.path.basename(p): cv2.imread(p) for p in paths}
+        return {name: f for name, f in frames.items() if f is not None}
+    from capture_engine import CaptureEngine
+    engine = CaptureEngine()
+    engine.start()
+    try:
+        frames, _ = engine.capture_set(timeout=5.0)
+    finally:
+        engine.stop()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较各编码器在实际拍摄画面上的速度和文件大小")
+    parser.add_argument("images", nargs="*", help="测试图片, 不指定则从相机各拍一帧")
+    parser.add_argument("--encoders", nargs="+", default=available_encoders())
+    parser.add_argument("--quality", type=int, default=95)
+    parser.add_argument("--subsampling", choices=SUBSAMPLING, default="420")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    frames = load_benchmark_frames(args.images)
+    if not frames:
+        print("没有可用的测试帧")
+        return
+    shape = next(iter(frames.values())).shape
+    print(f"{len(frames)} 帧, {shape[1]}x{shape[0]}")
+    print(f"{'编码器':<12}{'线程':>6}{'MB/s':>10}{'ms/帧':>10}{'KB/帧':>10}")
+    for name in args.encoders:
+        options = {}
+        if name in ('jpeg', 'turbojpeg'):
+            options = {'quality': args.quality, 'subsampling': args.subsampling}
+        elif name == 'webp':
+            options = {'quality': args.quality}
+        encoder = get_encoder(name, **options)
+        for threads in args.threads:
+            r = benchmark(encoder, frames, threads, args.repeat)
+            print(f"{name:<12}{threads:>6}{r['mb_per_s']:>10.1f}{r['ms_per_frame']:>10.2f}"
+                  f"{r['bytes_per_frame'] / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import os
+import re
+import glob
+import argparse
+import cv2
+import numpy as np
+
+# 每台相机一个增益/偏置文件: flatfield/<相机名>.npz, 包含 gain 和 offset, 形状 (H, W, 3)
+FLATFIELD_DIR = "flatfield"
+
+
+class FlatFieldCorrector:
+    """一次加载所有相机的增益/偏置图, 把一组图像叠成 (N, H, W, 3) 批量校正"""
+
+    def __init__(self, camera_names, maps_dir=FLATFIELD_DIR):
+        self.camera_names = []
+        gains, offsets = [], []
+        for name in camera_names:
+            path = os.path.join(maps_dir, f"{name}.npz")
+            if not os.path.exists(path):
+                print(f"相机 {name} 没有平场校正图 {path}")
+                continue
+            with np.load(path) as data:
+                gains.append(data["gain"].astype(np.float32))
+                offsets.append(data["offset"].astype(np.float32))
+            self.camera_names.append(name)
+        self.index = {name: i for i, name in enumerate(self.camera_names)}
+        if gains:
+            self.gain = np.stack(gains)
+            self.offset = np.stack(offsets)
+            self.buffer = np.empty(self.gain.shape, dtype=np.float32)
+        else:
+            self.gain = self.offset = self.buffer = None
+
+    def apply_stack(self, stack, indices=None):
+        """校正 (N, H, W, 3) 的uint8图像栈, indices为各帧对应的相机序号"""
+        if indices is None or list(indices) == list(range(len(self.camera_names))):
+            gain, offset = self.gain, self.offset
+            buf = self.buffer
+        else:
+            gain, offset = self.gain[indices], self.offset[indices]
+            buf = np.empty(gain.shape, dtype=np.float32)
+
+        np.subtract(stack, offset, out=buf)
+        np.multiply(buf, gain, out=buf)
+        np.clip(buf, 0, 255, out=buf)
+        return buf.astype(np.uint8)
+
+    def apply_set(self, frames):
+        """校正一组 {相机名: 帧}, 没有校正图或尺寸不符的相机原样返回"""
+        if self.gain is None:
+            return dict(frames)
+        shape = self.gain.shape[1:]
+        names = [n for n in frames if n in self.index and frames[n].shape == shape]
+        for name in frames:
+            if name not in names:
+                print(f"相机 {name} 没有匹配的平场校正图, 跳过校正")
+        if not names:
+            return dict(frames)
+
+        stack = np.stack([frames[n] for n in names])
+        corrected = self.apply_stack(stack, [self.index[n] for n in names])
+        result = dict(frames)
+        for i, name in enumerate(names):
+            result[name] = corrected[i]
+        return result
+
+
+def build_gain_maps(flat_frames, dark_frames=None, blur=31):
+    """根据平场靶标的连拍图像计算增益图
+
+    flat_frames / dark_frames: {相机名: [帧, ...]}
+    所有相机校正到同一亮度(各相机平均亮度的中位数), 返回 {相机名: (gain, offset)}
+    """
+    signals, offsets = {}, {}
+    for name, frames in flat_frames.items():
+        flat = np.mean(np.stack(frames).astype(np.float32), axis=0)
+        if dark_frames and name in dark_frames:
+            offset = np.mean(np.stack(dark_frames[name]).astype(np.float32), axis=0)
+        else:
+            offset = np.zeros_like(flat)
+        # 模糊去掉靶标上的纹理和噪声, 只保留渐晕的低频分量
+        signals[name] = cv2.GaussianBlur(flat - offset, (blur, blur), 0)
+        offsets[name] = offset
+
+    target = np.median(np.stack([s.reshape(-1, 3).mean(axis=0) for s in signals.values()]), axis=0)
+    maps = {}
+    for name, signal in signals.items():
+        gain = target / np.maximum(signal, 1.0)
+        maps[name] = (gain.astype(np.float32), offsets[name].astype(np.float32))
+    return maps
+
+
+def save_gain_maps(maps, maps_dir=FLATFIELD_DIR):
+    os.makedirs(maps_dir, exist_ok=True)
+    for name, (gain, offset) in maps.items():
+        np.savez(os.path.join(maps_dir, f"{name}.npz"), gain=gain, offset=offset)
+        print(f"已保存 {name} 的平场校正图")
+
+
+def load_burst(directory):
+    """按文件名 camera_<相机名>_<时间戳>.jpg 把目录中的图像按相机分组"""
+    frames = {}
+    pattern = re.compile(r"camera_(.+?)_\d{8}_\d{6}")
+    for path in sorted(glob.glob(os.path.join(directory, "camera_*.jpg"))):
+        match = pattern.match(os.path.basename(path))
+        if not match:
+            continue
+        frame = cv2.imread(path)
+        if frame is not None:
+            frames.setdefault(match.group(1), []).append(frame)
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="平场/渐晕校正工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="由平场靶标连拍生成增益图")
+    build.add_argument("flat_dir")
+    build.add_argument("--dark-dir", help="遮光拍摄的暗场图像目录")
+    build.add_argument("--out", default=FLATFIELD_DIR)
+    build.add_argument("--blur", type=int, default=31)
+
+    apply = sub.add_parser("apply", help="校正一组已保存的图像")
+    apply.add_argument("timestamp", help="例如 20240101_120000")
+    apply.add_argument("--dir", default=".")
+    apply.add_argument("--maps", default=FLATFIELD_DIR)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        flats = load_burst(args.flat_dir)
+        darks = load_burst(args.dark_dir) if args.dark_dir else None
+        save_gain_maps(build_gain_maps(flats, darks, args.blur), args.out)
+    else:
+        paths = glob.glob(os.path.join(args.dir, f"camera_*_{args.timestamp}.jpg"))
+        frames = {}
+        for path in paths:
+            name = os.path.basename(path)[len("camera_"):-len(f"_{args.timestamp}.jpg")]
+            frames[name] = cv2.imread(path)
+        corrector = FlatFieldCorrector(sorted(frames), args.maps)
+        for name, frame in corrector.apply_set(frames).items():
+            filename = os.path.join(args.dir, f"camera_{name}_{args.timestamp}_ff.jpg")
+            cv2.imwrite(filename, frame)
+            print(f"已保存 {filename}")
+
+
+if __name__ == "__main__":
+    main()
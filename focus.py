@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+
+SHARPNESS_SIZE = (320, 180)  # 计算清晰度用的降采样尺寸
+
+
+def _roi_gray(frame, roi=None, size=SHARPNESS_SIZE):
+    """截取ROI(x, y, w, h)并缩小为灰度图"""
+    if roi is not None:
+        x, y, w, h = roi
+        frame = frame[y:y + h, x:x + w]
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
+
+
+def sharpness_scores(frames, roi=None, size=SHARPNESS_SIZE):
+    """批量计算多帧的拉普拉斯方差, 数值越大画面越清晰"""
+    stack = np.stack([_roi_gray(f, roi, size) for f in frames]).astype(np.float32)
+    # 在 (N, H, W) 上一次性计算4邻域拉普拉斯
+    lap = (stack[:, :-2, 1:-1] + stack[:, 2:, 1:-1] +
+           stack[:, 1:-1, :-2] + stack[:, 1:-1, 2:] -
+           4.0 * stack[:, 1:-1, 1:-1])
+    return lap.reshape(len(frames), -1).var(axis=1)
+
+
+def read_sharpest(cap, count=5, roi=None, budget=None, camera=None):
+    """从相机连续读取count帧, 返回 (ret, 最清晰的一帧, 清晰度)
+
+    给出budget(FrameBudget)时候选帧从 'burst' 池申请内存, 超出预算时提前结束, 至少保留一帧;
+    返回的帧继续占用 'burst' 池中的 frame.nbytes, 调用方交给保存队列后用 budget.release 释放
+    """
+    frames = []
+    for _ in range(count):
+        ret, frame = cap.read()
+        if not ret:
+            continue
+        if budget is not None and not budget.acquire('burst', camera, frame.nbytes):
+            if frames:
+                break
+            # 第一帧无论如何都要保留, 照实记账
+            budget.charge('burst', camera, frame.nbytes)
+        frames.append(frame)
+    if not frames:
+        return False, None, 0.0
+
+    scores = sharpness_scores(frames, roi)
+    best = int(np.argmax(scores))
+    if budget is not None:
+        budget.release('burst', camera, sum(f.nbytes for i, f in enumerate(frames) if i != best))
+    return True, frames[best], float(scores[best])
+
+
+def log_sharpness(filename, score, log_path="focus_log.csv"):
+    """记录保存图片的清晰度"""
+    try:
+        with open(log_path, "a") as f:
+            f.write(f"{filename},{score:.2f}\n")
+    except OSError as e:
+        print(f"写入清晰度记录失败: {e}")
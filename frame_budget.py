@@ -0,0 +1,149 @@
+import os
+import time
+import threading
+
+# 所有缓存帧的结构(预览、同步缓冲、保存队列、连拍)从同一个预算中申请内存
+# 通过环境变量配置, 单位MB:
+#   FRAME_BUDGET_MB=1024         所有缓存帧合计上限
+#   FRAME_BUDGET_CAMERA_MB=256   单台相机的上限, 0表示不单独限制
+#   FRAME_BUDGET_RSS_MB=2048     进程常驻内存上限, 超过时只允许释放不允许新申请, 0表示不检查
+BUDGET_MB = float(os.environ.get("FRAME_BUDGET_MB", "1024"))
+CAMERA_BUDGET_MB = float(os.environ.get("FRAME_BUDGET_CAMERA_MB", "256"))
+RSS_LIMIT_MB = float(os.environ.get("FRAME_BUDGET_RSS_MB", "2048"))
+
+# 低优先级的池(预览、连拍)在用量超过上限的这一比例时就被拒绝, 给保存和同步留出余量
+LOW_PRIORITY_SHARE = 0.8
+RSS_CHECK_INTERVAL = 0.5
+
+MB = 1024 * 1024
+
+
+def frame_bytes(frame):
+    return getattr(frame, 'nbytes', 0)
+
+
+def process_rss():
+    """当前进程的常驻内存(字节), 无法读取时返回0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class FrameBudget:
+    """帧缓存的内存预算和用量统计
+
+    预算只负责记账和判断是否超限, 超限时怎么办由各结构按自己的策略处理:
+      预览  拒绝新帧(已在Qt事件队列中的帧无法撤回)
+      同步  丢弃自己缓冲区中最旧的帧后重试
+      保存  等待其他帧写盘释放, 超时则放弃这一组
+      连拍  拒绝后提前结束连拍
+    """
+
+    def __init__(self, total_mb=BUDGET_MB, per_camera_mb=CAMERA_BUDGET_MB, rss_limit_mb=RSS_LIMIT_MB):
+        self.limit = int(total_mb * MB)
+        self.camera_limit = int(per_camera_mb * MB) if per_camera_mb else None
+        self.rss_limit = int(rss_limit_mb * MB) if rss_limit_mb else None
+        self.low_priority = set()
+        self.condition = threading.Condition()
+        self.total = 0
+        self.pools = {}     # 池名 -> 字节数
+        self.cameras = {}   # 相机名 -> 字节数
+        self.peak = 0
+        self.refused = {}   # 池名 -> 被拒绝次数
+        self.rss = 0
+        self.last_rss_check = 0.0
+
+    def register(self, pool, low_priority=False):
+        with self.condition:
+            self.pools.setdefault(pool, 0)
+            self.refused.setdefault(pool, 0)
+            if low_priority:
+                self.low_priority.add(pool)
+
+    def _rss_exceeded(self):
+        if self.rss_limit is None:
+            return False
+        now = time.monotonic()
+        if now - self.last_rss_check > RSS_CHECK_INTERVAL:
+            self.last_rss_check = now
+            self.rss = process_rss()
+        return self.rss > self.rss_limit
+
+    def _fits(self, pool, camera, nbytes):
+        limit = self.limit * LOW_PRIORITY_SHARE if pool in self.low_priority else self.limit
+        if self.total + nbytes > limit:
+            return False
+        if self.camera_limit is not None and self.cameras.get(camera, 0) + nbytes > self.camera_limit:
+            return False
+        return not self._rss_exceeded()
+
+    def acquire(self, pool, camera, nbytes, timeout=0.0):
+        """申请nbytes, 超限时最多等待timeout秒, 失败返回False"""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while not self._fits(pool, camera, nbytes):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.refused[pool] = self.refused.get(pool, 0) + 1
+                    return False
+                # RSS要等垃圾回收等外部因素下降, 不会有释放通知, 所以定期重新检查
+                self.condition.wait(min(remaining, RSS_CHECK_INTERVAL))
+            self._add(pool, camera, nbytes)
+            return True
+
+    def charge(self, pool, camera, nbytes):
+        """不检查上限直接记账, 用于无论如何都要保留的帧, 让用量反映实际占用"""
+        with self.condition:
+            self._add(pool, camera, nbytes)
+
+    def _add(self, pool, camera, nbytes):
+        self.total += nbytes
+        self.pools[pool] = self.pools.get(pool, 0) + nbytes
+        self.cameras[camera] = self.cameras.get(camera, 0) + nbytes
+        self.peak = max(self.peak, self.total)
+
+    def release(self, pool, camera, nbytes):
+        with self.condition:
+            self.total -= nbytes
+            self.pools[pool] -= nbytes
+            self.cameras[camera] -= nbytes
+            self.condition.notify_all()
+
+    def usage(self):
+        """当前用量(MB)"""
+        with self.condition:
+            return {
+                'total_mb': self.total / MB,
+                'limit_mb': self.limit / MB,
+                'peak_mb': self.peak / MB,
+                'rss_mb': (self.rss or process_rss()) / MB,
+                'pools_mb': {pool: n / MB for pool, n in self.pools.items()},
+                'cameras_mb': {camera: n / MB for camera, n in self.cameras.items() if camera is not None},
+                'refused': dict(self.refused),
+            }
+
+
+def format_usage(usage):
+    pools = " ".join(f"{pool}={mb:.0f}" for pool, mb in usage['pools_mb'].items())
+    refused = sum(usage['refused'].values())
+    return (f"buffers {usage['total_mb']:.0f}/{usage['limit_mb']:.0f} MB ({pools}) "
+            f"peak {usage['peak_mb']:.0f} MB, RSS {usage['rss_mb']:.0f} MB, refused {refused}")
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_budget():
+    """进程内共享的预算, 第一次调用时创建并登记各个池"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = FrameBudget()
+            _default.register('preview', low_priority=True)
+            _default.register('burst', low_priority=True)
+            _default.register('sync')
+            _default.register('save')
+        return _default
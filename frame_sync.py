@@ -0,0 +1,147 @@
+import bisect
+import threading
+from collections import deque
+from frame_budget import frame_bytes, default_budget
+
+
+class FrameSynchronizer:
+    """把各相机独立的带时间戳帧流对齐为时间一致的帧组
+
+    每台相机一个按时间排序的缓冲区; 以各相机最早一帧中最晚的时间为基准,
+    每台相机取离基准最近的一帧, 全部落在容差以内就输出一组, 否则丢弃过旧的帧。
+    """
+
+    def __init__(self, camera_names, tolerance=0.010, max_buffer=30, on_tuple=None, budget=None):
+        self.camera_names = list(camera_names)
+        self.tolerance = tolerance      # 秒
+        self.max_buffer = max_buffer    # 每台相机最多缓存的帧数
+        self.on_tuple = on_tuple        # 输出回调 on_tuple(时间, {相机名: 帧}, 偏差)
+        self.budget = budget            # FrameBudget, 缓冲区中的帧从 'sync' 池申请内存
+        self.times = {name: deque() for name in self.camera_names}
+        self.frames = {name: deque() for name in self.camera_names}
+        self.lock = threading.Lock()
+        self.stats = {'frames_in': 0, 'frames_dropped': 0, 'tuples': 0, 'skew_sum': 0.0, 'skew_max': 0.0}
+
+    def push(self, name, timestamp, frame):
+        """加入一帧(可以在各相机的读取线程中直接调用), 返回凑齐的帧组列表"""
+        with self.lock:
+            times, frames = self.times[name], self.frames[name]
+            self.stats['frames_in'] += 1
+            if times and timestamp < times[-1]:
+                # 乱序帧直接丢弃, 保持缓冲区有序
+                self.stats['frames_dropped'] += 1
+                return []
+            if self.budget is not None:
+                # 超出预算时先丢弃本相机最旧的帧, 缓冲区空了还不够就丢弃新帧
+                while not self.budget.acquire('sync', name, frame_bytes(frame)):
+                    if not times:
+                        self.stats['frames_dropped'] += 1
+                        return []
+                    self._pop(name)
+                    self.stats['frames_dropped'] += 1
+            times.append(timestamp)
+            frames.append(frame)
+            if len(times) > self.max_buffer:
+                self._pop(name)
+                self.stats['frames_dropped'] += 1
+            results = self._match()
+
+        if self.on_tuple is not None:
+            for result in results:
+                self.on_tuple(*result)
+        return results
+
+    def _pop(self, name):
+        self.times[name].popleft()
+        frame = self.frames[name].popleft()
+        if self.budget is not None:
+            self.budget.release('sync', name, frame_bytes(frame))
+        return frame
+
+    def _drop_before(self, name, limit):
+        times = self.times[name]
+        while times and times[0] < limit:
+            self._pop(name)
+            self.stats['frames_dropped'] += 1
+
+    def _match(self):
+        results = []
+        while all(self.times[name] for name in self.camera_names):
+            pivot = max(self.times[name][0] for name in self.camera_names)
+            chosen = {}
+            for name in self.camera_names:
+                times = self.times[name]
+                i = bisect.bisect_left(times, pivot)
+                # 在基准两侧各看一帧, 取最近的
+                candidates = [j for j in (i - 1, i) if 0 <= j < len(times)]
+                chosen[name] = min(candidates, key=lambda j: abs(times[j] - pivot))
+
+            stamps = [self.times[name][chosen[name]] for name in self.camera_names]
+            skew = max(stamps) - min(stamps)
+            if skew <= self.tolerance:
+                group = {}
+                for name in self.camera_names:
+                    # 选中帧之前的帧不会再被使用
+                    self._drop_before(name, self.times[name][chosen[name]])
+                    group[name] = self._pop(name)
+                self.stats['tuples'] += 1
+                self.stats['skew_sum'] += skew
+                self.stats['skew_max'] = max(self.stats['skew_max'], skew)
+                results.append((sum(stamps) / len(stamps), group, skew))
+                continue
+
+            # 凑不齐: 丢弃早于 基准-容差 的帧, 以及后面还有更接近基准的帧的队首帧
+            limit = pivot - self.tolerance
+            progressed = False
+            for name in self.camera_names:
+                times = self.times[name]
+                if times[0] < limit or chosen[name] > 0:
+                    self._drop_before(name, max(limit, times[chosen[name]]))
+                    progressed = True
+            if not progressed:
+                break
+        return results
+
+    def report(self):
+        """匹配率和剩余偏差"""
+        with self.lock:
+            s = dict(self.stats)
+        frames_per_camera = s['frames_in'] / len(self.camera_names) if self.camera_names else 0
+        return {
+            'tuples': s['tuples'],
+            'match_rate': s['tuples'] / frames_per_camera if frames_per_camera else 0.0,
+            'frames_dropped': s['frames_dropped'],
+            'skew_mean_ms': s['skew_sum'] / s['tuples'] * 1000 if s['tuples'] else 0.0,
+            'skew_max_ms': s['skew_max'] * 1000,
+        }
+
+
+def main():
+    import time
+    import argparse
+    from capture_engine import CaptureEngine
+
+    parser = argparse.ArgumentParser(description="多相机连续帧流的时间对齐")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="容差(毫秒)")
+    parser.add_argument("--duration", type=float, default=10.0, help="运行时间(秒)")
+    args = parser.parse_args()
+
+    engine = CaptureEngine()
+    sync = FrameSynchronizer(engine.camera_names, tolerance=args.tolerance / 1000, budget=default_budget())
+    engine.add_listener(sync.push)
+    engine.start()
+    try:
+        end = time.monotonic() + args.duration
+        while time.monotonic() < end:
+            time.sleep(1.0)
+            r = sync.report()
+            print(f"帧组 {r['tuples']}, 匹配率 {r['match_rate']:.1%}, 丢弃 {r['frames_dropped']} 帧, "
+                  f"偏差 平均 {r['skew_mean_ms']:.2f} ms / 最大 {r['skew_max_ms']:.2f} ms")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from collections import OrderedDict
+import cv2
+import numpy as np
+from PyQt5.QtWidgets import QWidget, QTableView, QVBoxLayout, QHBoxLayout, QPushButton, QLabel, QHeaderView
+from PyQt5.QtCore import Qt, QObject, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap, QColor
+from catalog import CATALOG_PATH
+from capture_archive import ArchiveReader
+from thread_tuning import apply_role
+
+THUMB_SIZE = (192, 108)
+THUMB_CACHE_DIR = ".thumbnails"
+MEMORY_CACHE_SIZE = 2000   # 内存中保留的缩略图数量
+MAX_PENDING = 200          # 排队等待生成的缩略图上限, 超出时丢弃最早的请求
+
+# 时间戳后面可能带毫秒或组序号, 例如 camera_video0_20240101_120000_000042.jpg
+FILE_PATTERN = re.compile(r"camera_(.+?)_(\d{8}_\d{6}(?:_\d+)*)\.(?:jpg|png|webp)$")
+
+
+def _catalog_sets(db_path):
+    """返回 [(拍摄时间, 标题, {相机名: 文件})], 最新的在前"""
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT s.id, s.time, c.camera, c.file FROM capture_sets s "
+        "JOIN captures c ON c.set_id = s.id WHERE c.status = 'ok' "
+        "ORDER BY s.id DESC").fetchall()
+    conn.close()
+    sets = OrderedDict()
+    for set_id, set_time, camera, path in rows:
+        entry = sets.setdefault(set_id, (set_time, {}))
+        entry[1][camera] = path
+    return [(set_time, f"#{set_id}", files) for set_id, (set_time, files) in sets.items()]
+
+
+def load_sets_from_catalog(db_path=CATALOG_PATH):
+    """从拍摄记录数据库读取所有拍摄组, 返回 [(标题, {相机名: 文件})], 最新的在前"""
+    return [(title, files) for _, title, files in _catalog_sets(db_path)]
+
+
+def load_sets_from_directory(directory="."):
+    """按文件名中的时间戳把单独保存的jpg分组"""
+    sets = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = FILE_PATTERN.match(entry.name)
+            if match:
+                sets.setdefault(match.group(2), {})[match.group(1)] = entry.path
+    return [(stamp, sets[stamp]) for stamp in sorted(sets, reverse=True)]
+
+
+def load_sets(directory=".", db_path=CATALOG_PATH):
+    """数据库中的拍摄组, 加上目录中没有登记到数据库的单独文件(例如gui6直接保存的图像), 按时间排列"""
+    if not os.path.exists(db_path):
+        return load_sets_from_directory(directory)
+    entries = _catalog_sets(db_path)
+    registered = {os.path.abspath(path) for _, _, files in entries for path in files.values()}
+    for stamp, files in load_sets_from_directory(directory):
+        files = {camera: path for camera, path in files.items() if os.path.abspath(path) not in registered}
+        if files:
+            entries.append((datetime.strptime(stamp[:15], "%Y%m%d_%H%M%S").timestamp(), stamp, files))
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    return [(title, files) for _, title, files in entries]
+
+
+class ThumbnailCache(QObject):
+    """缩略图缓存: 内存LRU + 磁盘缓存, 后台线程生成"""
+    thumbnail_ready = pyqtSignal(str, np.ndarray)
+
+    def __init__(self, cache_dir=THUMB_CACHE_DIR, workers=4):
+        super().__init__()
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.memory = OrderedDict()
+        self.pending = OrderedDict()
+        self.failed = {}    # 生成失败的路径 -> 失败时的文件状态, 文件没有变化前不再重试
+        self.condition = threading.Condition()
+        self.running = True
+        self.archives = {}
+        self.archive_lock = threading.Lock()
+        self.workers = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for worker in self.workers:
+            worker.start()
+
+    def get(self, path):
+        """取内存中的缩略图, 没有时加入生成队列并返回None"""
+        pixmap = self.memory.get(path)
+        if pixmap is not None:
+            self.memory.move_to_end(path)
+            return pixmap
+        if path in self.failed and self.failed[path] == self._file_state(path):
+            # 坏文件每次重绘都重新排队会让生成线程一直忙
+            return None
+        with self.condition:
+            if path not in self.pending:
+                self.pending[path] = True
+                if len(self.pending) > MAX_PENDING:
+                    self.pending.popitem(last=False)
+                self.condition.notify()
+        return None
+
+    def put(self, path, thumb):
+        """在GUI线程中把生成好的缩略图放入内存缓存"""
+        rgb = cv2.cvtColor(thumb, cv2.COLOR_BGR2RGB)
+        h, w, ch = rgb.shape
+        image = QImage(rgb.data, w, h, ch * w, QImage.Format_RGB888)
+        pixmap = QPixmap.fromImage(image)
+        self.memory[path] = pixmap
+        if len(self.memory) > MEMORY_CACHE_SIZE:
+            self.memory.popitem(last=False)
+        return pixmap
+
+    def _file_state(self, path):
+        """文件的修改时间和大小; 分片中的图像看分片文件(追加新组后会重试失败的图像)"""
+        try:
+            st = os.stat(path.split('#', 1)[0])
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _cache_path(self, path):
+        if '#' in path:
+            # 分片文件中的记录写入后不再改变, 直接以位置作为键
+            key = path
+        else:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            key = f"{path}:{st.st_mtime_ns}:{st.st_size}"
+        key = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key[:2], key + ".jpg")
+
+    def _read_reduced(self, path):
+        """以1/4尺寸解码JPEG(DCT缩放, 不需要完整解码)"""
+        if '#' in path:
+            # 分片文件中的图像: <文件>.cset#<set_id>#<相机名>
+            shard, set_id, camera = path.rsplit('#', 2)
+            with self.archive_lock:
+                reader = self.archives.get(shard)
+                if reader is None or int(set_id) >= len(reader):
+                    # 第一次打开, 或者打开之后分片中又追加了新的组: 重新读取索引和映射
+                    if reader is not None:
+                        reader.close()
+                    reader = self.archives[shard] = ArchiveReader(shard[:-len(".cset")])
+                _, images = reader.read_set(int(set_id))
+                data = np.frombuffer(bytes(images.get(camera, b"")), np.uint8)
+                del images
+            return cv2.imdecode(data, cv2.IMREAD_REDUCED_COLOR_4) if data.size else None
+        return cv2.imread(path, cv2.IMREAD_REDUCED_COLOR_4)
+
+    def _load(self, path):
+        cache_path = self._cache_path(path)
+        if cache_path is not None and os.path.exists(cache_path):
+            thumb = cv2.imread(cache_path)
+            if thumb is not None:
+                return thumb
+        image = self._read_reduced(path)
+        if image is None:
+            return None
+        thumb = cv2.resize(image, THUMB_SIZE, interpolation=cv2.INTER_AREA)
+        if cache_path is not None:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            cv2.imwrite(cache_path, thumb, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        return thumb
+
+    def _worker(self):
+        apply_role('encode')
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.running:
+                    return
+                # 优先生成最近请求的(也就是当前可见的)缩略图
+                path, _ = self.pending.popitem(last=True)
+            state = self._file_state(path)
+            try:
+                thumb = self._load(path)
+            except Exception as e:
+                print(f"生成缩略图失败 {path}: {e}")
+                thumb = None
+            if thumb is not None:
+                self.failed.pop(path, None)
+                self.thumbnail_ready.emit(path, thumb)
+            else:
+                self.failed[path] = state
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+
+class GalleryModel(QAbstractTableModel):
+    """每行一个拍摄组, 每列一台相机; 只有视图请求的单元格才会加载缩略图"""
+
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.sets = []
+        self.cameras = []
+        self.locations = {}
+        self.placeholder = QPixmap(*THUMB_SIZE)
+        self.placeholder.fill(QColor(40, 40, 40))
+        cache.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+    def set_capture_sets(self, sets):
+        self.beginResetModel()
+        self.sets = sets
+        self.cameras = sorted({camera for _, files in sets for camera in files},
+                              key=lambda c: (len(c), c))
+        self.locations = {}
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return len(self.sets)
+
+    def columnCount(self, parent=QModelIndex()):
+        return len(self.cameras)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.cameras[section]
+        return self.sets[section][0]
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DecorationRole:
+            return None
+        path = self.sets[index.row()][1].get(self.cameras[index.column()])
+        if path is None:
+            return None
+        pixmap = self.cache.get(path)
+        if pixmap is None:
+            self.locations[path] = (index.row(), index.column())
+            return self.placeholder
+        return pixmap
+
+    def on_thumbnail_ready(self, path, thumb):
+        self.cache.put(path, thumb)
+        location = self.locations.pop(path, None)
+        if location is not None:
+            index = self.index(*location)
+            self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+
+class GalleryTab(QWidget):
+    """浏览历史拍摄组的标签页"""
+
+    def __init__(self, directory=".", db_path=CATALOG_PATH):
+        super().__init__()
+        self.directory = directory
+        self.db_path = db_path
+        self.loaded = False
+
+        layout = QVBoxLayout()
+        self.setLayout(layout)
+        controls = QHBoxLayout()
+        self.status_label = QLabel()
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        controls.addWidget(self.status_label)
+        controls.addStretch()
+        controls.addWidget(refresh_button)
+        layout.addLayout(controls)
+
+        self.cache = ThumbnailCache()
+        self.model = GalleryModel(self.cache)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setIconSize(self.model.placeholder.size())
+        # 固定行高和列宽, 视图不需要测量每一行, 十万行也能流畅滚动
+        self.view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.verticalHeader().setDefaultSectionSize(THUMB_SIZE[1] + 8)
+        self.view.horizontalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.view.horizontalHeader().setDefaultSectionSize(THUMB_SIZE[0] + 8)
+        layout.addWidget(self.view)
+
+    def showEvent(self, event):
+        # 第一次切换到本页时才加载列表
+        if not self.loaded:
+            self.refresh()
+        super().showEvent(event)
+
+    def refresh(self):
+        sets = load_sets(self.directory, self.db_path)
+        # 分片文件中的图像在数据库里记为 "<文件>.cset#<set_id>", 补上相机名
+        for _, files in sets:
+            for camera, path in files.items():
+                if '#' in path:
+                    files[camera] = f"{path}#{camera}"
+        self.model.set_capture_sets(sets)
+        self.status_label.setText(f"{len(sets)} capture sets")
+        self.loaded = True
+
+    def shutdown(self):
+        """停止缩略图生成线程"""
+        self.cache.stop()
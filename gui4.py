@@ -8,11 +8,22 @@ import time
 from datetime import datetime
 import subprocess
 from threading import Event, Thread
+from motion import MotionDetector
+from focus import read_sharpest, log_sharpness
+
+# 运动触发参数: 检测区域为归一化坐标 (x0, y0, x1, y1), None表示全画面
+MOTION_REGIONS = None
+MOTION_AREA_THRESHOLD = 0.01
+MOTION_COOLDOWN = 3.0
+
+# 拍照时读取的候选帧数, 只保存最清晰的一帧
+SHARPEST_OF_N = 5
 
 class CameraThread(QThread):
     frame_signal = pyqtSignal(np.ndarray)
     save_completed_signal = pyqtSignal()
     ready_signal = pyqtSignal()
+    motion_signal = pyqtSignal(float)
     
     def __init__(self, device_path, is_preview=False, resolution=(320, 240)):
         super().__init__()
@@ -24,6 +35,7 @@ class CameraThread(QThread):
         self.is_preview = is_preview
         self.sync_event = Event()  # 用于同步拍照
         self.ready_event = Event()  # 用于指示相机就绪
+        self.motion_detector = None  # 设置后在预览流上做运动检测
         
     def setup_camera_parameters(self):
         """设置相机参数"""
@@ -81,17 +93,20 @@ class CameraThread(QThread):
         def capture_thread():
             self.prepare_for_capture()
             
-            ret, frame = self.cap.read()
+            ret, frame, score = read_sharpest(self.cap, SHARPEST_OF_N)
             if ret:
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 filename = f"camera_{self.device_path.split('/')[-1]}_{timestamp}.jpg"
                 cv2.imwrite(filename, frame)
+                log_sharpness(filename, score)
             
             if not self.is_preview:
                 self.release_camera()
             else:
                 self.change_resolution(320, 240)
                 self.setup_camera_parameters()
+                if self.motion_detector is not None:
+                    self.motion_detector.reset()
             
             self.save_completed_signal.emit()
             
@@ -109,6 +124,9 @@ class CameraThread(QThread):
                     ret, frame = self.cap.read()
                     if ret:
                         self.frame_signal.emit(frame)
+                        detector = self.motion_detector
+                        if detector is not None and detector.update(frame):
+                            self.motion_signal.emit(detector.score)
             self.release_camera()
         else:
             # 非预览相机只在需要时初始化和运行
@@ -164,6 +182,8 @@ class MainWindow(QMainWindow):
             
             if is_preview:
                 thread.frame_signal.connect(self.update_frame)
+                thread.motion_signal.connect(self.on_motion_detected)
+                self.preview_thread = thread
             thread.save_completed_signal.connect(self.on_save_completed)
             thread.ready_signal.connect(self.on_camera_ready)
             
@@ -174,6 +194,30 @@ class MainWindow(QMainWindow):
         self.save_button.clicked.connect(self.save_all_frames)
         layout.addWidget(self.save_button)
         
+        self.motion_button = QPushButton("Motion Trigger: Off")
+        self.motion_button.setCheckable(True)
+        self.motion_button.toggled.connect(self.toggle_motion_trigger)
+        layout.addWidget(self.motion_button)
+        
+    def toggle_motion_trigger(self, enabled):
+        """开启/关闭运动触发拍照"""
+        if enabled:
+            self.preview_thread.motion_detector = MotionDetector(
+                area_threshold=MOTION_AREA_THRESHOLD,
+                regions=MOTION_REGIONS,
+                cooldown=MOTION_COOLDOWN)
+            self.motion_button.setText("Motion Trigger: On")
+        else:
+            self.preview_thread.motion_detector = None
+            self.motion_button.setText("Motion Trigger: Off")
+    
+    def on_motion_detected(self, score):
+        """检测到运动时触发所有相机拍照"""
+        if not self.save_button.isEnabled():
+            return  # 上一次拍照尚未完成
+        print(f"检测到运动 (score={score:.3f}), 开始拍照")
+        self.save_all_frames()
+        
     def update_frame(self, frame):
         h, w = frame.shape[:2]
         display_w = self.display.width()
@@ -1,32 +1,91 @@
 import sys
 import cv2
 import numpy as np
-from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QPushButton, QGridLayout
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QLabel, QPushButton, QGridLayout, QTabWidget
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QEvent
 from PyQt5.QtGui import QImage, QPixmap
 import time
 from datetime import datetime
 import subprocess
+from threading import Event
+from motion import ChangeDetector
+from undistort import load_undistorter
+from roi import load_rois, crop, apply_driver_crop, set_driver_crop, draw_roi
+from capture_backend import open_capture
+from latency import configure_low_latency, read_latest
+from encoders import get_encoder
+from frame_budget import default_budget, format_usage
+from thread_tuning import apply_role
+from device_watcher import DeviceWatcher, load_camera_list, camera_name, resolve
+from startup_profile import profiler
 
-# 定义相机分组
-CAMERA_GROUPS = [
-    ['/dev/video0', '/dev/video2', '/dev/video4'],
-    ['/dev/video6', '/dev/video8', '/dev/video10']
-]
+# 静止场景抑制: 画面无变化时跳过预览重绘 / 跳过重复保存
+SKIP_IDLE_FRAMES = True
+SKIP_UNCHANGED_SAVES = False
+CHANGE_THRESHOLD = 2.0
+
+# 有标定文件的相机在保存前做去畸变, 预览是否去畸变可选
+UNDISTORT_PREVIEW = False
+
+# 每组同时预览的相机数; 按相机列表(cameras.json)的顺序每GROUP_SIZE台分为一组轮流显示
+GROUP_SIZE = 3
+
+# 断线后等待设备重新出现的最长时间; 正常情况下由设备事件立即唤醒
+RECONNECT_TIMEOUT = 5.0
+
+# 分组切换时暂停的相机保持打开, 只停止数据流(不占USB带宽), 恢复时约一个帧间隔出图
+WARM_STANDBY = True
+
+# 低延迟模式: 驱动队列只保留最少的缓冲区, 每次读取最新一帧; 关闭时按队列顺序读取(吞吐优先)
+# 用 latency.py 测量两种模式的端到端延迟
+LOW_LATENCY = True
+
+# 保存格式和压缩参数, 见 encoders.py (jpeg / turbojpeg / png / webp / npy)
+SAVE_ENCODER = get_encoder('jpeg', quality=95)
+
+# 预览帧率(0表示不限): 点击选中的画面全速, 其他画面降速; 窗口不在前台时全部降速,
+# 最小化、隐藏或切到其他标签页时停止预览, 相机只出队不解码
+PREVIEW_FPS_FOCUSED = 0
+PREVIEW_FPS_OTHERS = 5
+PREVIEW_FPS_INACTIVE = 2
+MIN_TILE_WIDTH = 160  # 画面显示得比这还小时按非焦点画面处理
 
 class CameraThread(QThread):
     frame_signal = pyqtSignal(np.ndarray)
     save_completed_signal = pyqtSignal()
     error_signal = pyqtSignal(str)
     
-    def __init__(self, device_path, resolution=(1280, 720)):
+    def __init__(self, identity, watcher, resolution=(1280, 720), roi=None):
         super().__init__()
-        self.device_path = device_path
+        self.identity = identity  # 稳定标识, USB复位后设备节点可能改变
+        self.camera_name = camera_name(identity)
+        self.device_event = Event()
+        self.device_path = watcher.subscribe(identity, self.on_device_changed) or identity
+        self.failures = 0
+        self.opened_once = False
         self.resolution = resolution
         self.running = True
         self.paused = False
+        self.resume_event = Event()
         self.save_flag = False
         self.cap = None
+        self.preview_detector = ChangeDetector(threshold=CHANGE_THRESHOLD)
+        self.save_detector = ChangeDetector(threshold=CHANGE_THRESHOLD)
+        self.undistorter = load_undistorter(identity)
+        self.roi = roi
+        self.driver_cropped = False  # 驱动已输出ROI区域时不再软件裁剪
+        self.driver_crop_unsupported = False  # 驱动裁剪后输出尺寸不对, 以后只用软件裁剪
+        self.preview_interval = 0.0  # 预览最小间隔(秒), None表示不需要预览
+        self.last_preview = 0.0
+        self.budget = default_budget()  # 等待界面绘制的预览帧从 'preview' 池申请内存
+        self.metrics = {
+            'frames': 0,
+            'frames_skipped': 0,
+            'frames_not_decoded': 0,
+            'preview_dropped': 0,
+            'saves_skipped': 0,
+            'change_score': 0.0,
+        }
         
     def setup_camera_parameters(self):
         """设置相机参数"""
@@ -34,6 +93,10 @@ class CameraThread(QThread):
             #设置手动曝光
             self.cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 3)
             
+            # V4L2Capture直接用ioctl设置控制项, 不需要为每台相机启动v4l2-ctl进程
+            if hasattr(self.cap, 'stream_off') and self.cap.set(cv2.CAP_PROP_AUTO_WB, 1):
+                return
+            
             #尝试通过v4l2设置参数
             try:
                 subprocess.run([
@@ -45,64 +108,176 @@ class CameraThread(QThread):
             except Exception as e:
                 self.error_signal.emit(f"v4l2-ctl error for {self.device_path}: {e}")
     
-    def change_resolution(self, width, height):
+    def change_resolution(self, width, height, discard=5):
         if self.cap is not None:
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            if hasattr(self.cap, 'set_format'):
+                # 宽高一次协商, 逐项设置会重新分配两次缓冲区
+                self.cap.set_format(width, height)
+            else:
+                self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+                self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
             # 丢弃几帧以确保分辨率已经改变
-            for _ in range(5):
+            for _ in range(discard):
                 self.cap.read()
     
+    def check_driver_crop(self):
+        """驱动裁剪后读一帧, 确认输出尺寸等于ROI"""
+        ret, frame = self.cap.read()
+        _, _, w, h = self.roi
+        return ret and frame.shape[:2] == (h, w)
+    
+    def on_device_changed(self, identity, path):
+        """设备监视线程回调: 设备重新出现(可能换了 /dev/videoN)时唤醒采集线程"""
+        if path is not None:
+            self.device_path = path
+            self.device_event.set()
+    
+    def wait_for_device(self):
+        """打开或读取失败后等待重连; 设备节点还在时(偶发读取失败)先立即重试一次"""
+        self.failures += 1
+        if self.failures == 1 and resolve(self.identity) is not None:
+            return
+        self.device_event.wait(RECONNECT_TIMEOUT)
+    
     def pause(self):
-        """暂停相机采集"""
+        """暂停相机采集, 相机的停流或释放在采集线程中进行"""
+        self.resume_event.clear()
         self.paused = True
-        if self.cap is not None:
-            self.cap.release()
-            self.cap = None
     
     def resume(self):
         """恢复相机采集"""
         self.paused = False
+        self.resume_event.set()
+    
+    def read_frame(self):
+        return read_latest(self.cap) if LOW_LATENCY else self.cap.read()
+    
+    def grab_frame(self):
+        """只出队不解码"""
+        if LOW_LATENCY and hasattr(self.cap, 'grab_latest'):
+            return self.cap.grab_latest()
+        return self.cap.grab()
+    
+    def preview_due(self):
+        interval = self.preview_interval
+        if interval is None:
+            return False
+        now = time.monotonic()
+        if now - self.last_preview < interval:
+            return False
+        self.last_preview = now
+        return True
+    
+    def enter_standby(self):
+        """暂停时: 支持时只停止数据流, 否则释放相机"""
+        if self.cap is None:
+            return
+        if hasattr(self.cap, 'stream_off'):
+            self.cap.stream_off()
+        else:
+            self.cap.release()
+            self.cap = None
     
     def run(self):
+        apply_role('capture')
         while self.running:
             try:
                 if self.paused:
-                    time.sleep(0.1)
+                    self.enter_standby()
+                    self.resume_event.wait(0.5)
                     continue
                 
                 # 如果相机未初始化，进行初始化
                 if self.cap is None:
-                    self.cap = cv2.VideoCapture(self.device_path)
+                    self.device_event.clear()
+                    with profiler.phase(self.camera_name, 'open'):
+                        self.cap = open_capture(self.device_path, standby=WARM_STANDBY)
                     if not self.cap.isOpened():
                         self.error_signal.emit(f"Failed to open camera {self.device_path}")
-                        time.sleep(1)
+                        self.cap.release()
+                        self.cap = None
+                        self.wait_for_device()
+                        continue
+                    with profiler.phase(self.camera_name, 'format'):
+                        self.change_resolution(self.resolution[0], self.resolution[1], discard=0)
+                    with profiler.phase(self.camera_name, 'controls'):
+                        self.setup_camera_parameters()
+                        if LOW_LATENCY:
+                            configure_low_latency(self.cap)
+                    # 驱动裁剪要在开始数据流之前设置, 数据流运行时驱动会拒绝
+                    previous_crop = None
+                    self.driver_cropped = False
+                    if self.roi is not None and not self.driver_crop_unsupported:
+                        previous_crop = apply_driver_crop(self.device_path, self.roi)
+                    # 重连时分辨率和参数沿用之前的设置, 不再丢帧等待
+                    if not self.opened_once:
+                        with profiler.phase(self.camera_name, 'first_frame'):
+                            # cv2后端改分辨率后前几帧可能还是旧格式; V4L2Capture设置格式是同步的, 等到第一帧即可
+                            for _ in range(1 if hasattr(self.cap, 'stream_off') else 5):
+                                self.cap.grab()
+                    self.opened_once = True
+                    if previous_crop is not None and not self.check_driver_crop():
+                        # 驱动把裁剪区域缩放回了协商的分辨率: 关闭相机(停止数据流)后恢复原来的区域
+                        self.driver_crop_unsupported = True
+                        self.cap.release()
+                        self.cap = None
+                        set_driver_crop(self.device_path, previous_crop)
                         continue
-                    self.change_resolution(self.resolution[0], self.resolution[1])
-                    self.setup_camera_parameters()
+                    self.driver_cropped = previous_crop is not None
+                    self.preview_detector.reset()
                 
-                ret, frame = self.cap.read()
+                if self.preview_due():
+                    ret, frame = self.read_frame()
+                elif self.save_flag:
+                    ret, frame = True, None  # 保存流程自己读取
+                else:
+                    # 没有人看的帧只出队不解码, 相机保持出图以便随时保存
+                    ret, frame = self.grab_frame(), None
+                    self.metrics['frames_not_decoded'] += 1
                 if not ret:
                     self.error_signal.emit(f"Failed to read frame from {self.device_path}")
                     if self.cap is not None:
                         self.cap.release()
                         self.cap = None
-                    time.sleep(1)
+                    self.wait_for_device()
                     continue
+                self.failures = 0
                 
-                self.frame_signal.emit(frame)
+                if frame is not None:
+                    if self.undistorter is not None and UNDISTORT_PREVIEW:
+                        frame = self.undistorter.apply(frame)
+                    
+                    self.metrics['frames'] += 1
+                    changed = self.preview_detector.update(frame)
+                    self.metrics['change_score'] = self.preview_detector.score
+                    if not changed and SKIP_IDLE_FRAMES:
+                        self.metrics['frames_skipped'] += 1
+                    elif self.budget.acquire('preview', self.camera_name, frame.nbytes):
+                        self.frame_signal.emit(frame)
+                    else:
+                        # 界面来不及绘制, 积压的预览帧超出预算
+                        self.metrics['preview_dropped'] += 1
                 
                 if self.save_flag:
-                    # 切换到高分辨率
-                    self.change_resolution(1280, 720)
-                    # 等待几帧以确保获得高分辨率图像
-                    time.sleep(0.1)
-                    ret, frame = self.cap.read()
+                    # 切换到高分辨率(已经是该分辨率时不再重新协商; 驱动裁剪时输出就是ROI尺寸)
+                    if not self.driver_cropped and \
+                            (self.cap.get(cv2.CAP_PROP_FRAME_WIDTH), self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) != (1280, 720):
+                        self.change_resolution(1280, 720)
+                        # 等待几帧以确保获得高分辨率图像
+                        time.sleep(0.1)
+                    ret, frame = self.read_frame()
+                    if ret and self.undistorter is not None:
+                        frame = self.undistorter.apply(frame)
                     
-                    if ret:
+                    if ret and SKIP_UNCHANGED_SAVES and not self.save_detector.update(frame):
+                        # 与上次保存的画面相同, 不重复写盘
+                        self.metrics['saves_skipped'] += 1
+                    elif ret:
                         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"camera_{self.device_path.split('/')[-1]}_{timestamp}.jpg"
-                        cv2.imwrite(filename, frame)
+                        filename = f"camera_{self.camera_name}_{timestamp}{SAVE_ENCODER.ext}"
+                        if not self.driver_cropped:
+                            frame = crop(frame, self.roi)
+                        SAVE_ENCODER.save(filename, frame)
                     
                     self.save_flag = False
                     self.save_completed_signal.emit()
@@ -112,12 +287,20 @@ class CameraThread(QThread):
                 if self.cap is not None:
                     self.cap.release()
                     self.cap = None
-                time.sleep(1)
+                self.wait_for_device()
+        
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
     
     def stop(self):
         self.running = False
-        if self.cap is not None:
-            self.cap.release()
+        self.device_event.set()
+        self.resume_event.set()
+    
+    def preview_done(self, frame):
+        """界面绘制完一帧后归还预览预算"""
+        self.budget.release('preview', self.camera_name, frame.nbytes)
             
     def save_frame(self):
         self.save_flag = True
@@ -128,52 +311,79 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Multi-Camera Viewer")
         self.setGeometry(100, 100, 1200, 800)
         
+        # 实时画面和历史拍摄组浏览分为两个标签页
+        self.tabs = QTabWidget()
+        self.setCentralWidget(self.tabs)
         main_widget = QWidget()
-        self.setCentralWidget(main_widget)
         layout = QGridLayout()
         main_widget.setLayout(layout)
+        self.tabs.addTab(main_widget, "Live")
+        # 浏览页在第一次切换过去时才创建, 启动时不加载数据库和缩略图模块
+        self.gallery = None
+        self.tabs.addTab(QWidget(), "Gallery")
+        self.tabs.currentChanged.connect(self.on_tab_changed)
         
         self.displays = []
         self.camera_threads = []
         self.save_count = 0
         self.current_group = 0
+        self.focused_index = None  # 点击选中的画面, 全速预览
+        self.tabs.currentChanged.connect(self.update_preview_rates)
         
-        camera_devices = ['/dev/video0', '/dev/video2', '/dev/video4', 
-                         '/dev/video6', '/dev/video8', '/dev/video10']
+        camera_devices = load_camera_list()
+        self.camera_groups = [list(range(start, min(start + GROUP_SIZE, len(camera_devices))))
+                              for start in range(0, len(camera_devices), GROUP_SIZE)]
+        rois = load_rois()
+        self.device_watcher = DeviceWatcher()
         
-        # 在启动相机前，先用v4l2-ctl设置所有相机的参数
-        for device in camera_devices:
+        # 在启动相机前，先用v4l2-ctl设置所有相机的参数(各相机同时进行)
+        processes = []
+        for identity in camera_devices:
+            device = resolve(identity) or identity
             try:
-                subprocess.run([
+                processes.append(subprocess.Popen([
                     'v4l2-ctl',
                     '-d', device,
                     '--set-fmt-video=width=320,height=240,pixelformat=YUYV',
                     '--set-parm=2'
-                ])
+                ]))
             except Exception as e:
                 print(f"Error setting up camera {device}: {e}")
+        for process in processes:
+            process.wait()
         
         # 创建相机显示和线程
-        for i in range(6):
+        for i in range(len(camera_devices)):
             display = QLabel()
             display.setMinimumSize(400, 300)
             display.setAlignment(Qt.AlignCenter)
             display.setStyleSheet("border: 1px solid black")
+            display.installEventFilter(self)
             self.displays.append(display)
             layout.addWidget(display, i // 3, i % 3)
             
-            thread = CameraThread(camera_devices[i])
-            thread.frame_signal.connect(lambda frame, display=display: 
-                                      self.update_frame(frame, display))
+            thread = CameraThread(camera_devices[i], self.device_watcher,
+                                  roi=rois.get(camera_name(camera_devices[i])))
+            thread.frame_signal.connect(lambda frame, display=display, thread=thread: 
+                                      self.update_frame(frame, display, thread))
             thread.save_completed_signal.connect(self.on_save_completed)
             thread.error_signal.connect(lambda msg: print(f"Error: {msg}"))
             self.camera_threads.append(thread)
             thread.start()
+        self.device_watcher.start()
         
         # 添加控制按钮
         self.save_button = QPushButton("Save All Frames")
         self.save_button.clicked.connect(self.save_all_frames)
-        layout.addWidget(self.save_button, 2, 1)
+        rows = (len(camera_devices) + 2) // 3
+        layout.addWidget(self.save_button, rows, 1)
+        
+        # 各相机的变化分数和跳帧统计
+        self.metrics_label = QLabel()
+        layout.addWidget(self.metrics_label, rows + 1, 0, 1, 3)
+        self.metrics_timer = QTimer()
+        self.metrics_timer.timeout.connect(self.update_metrics)
+        self.metrics_timer.start(1000)
         
         # 设置相机组切换定时器
         self.switch_timer = QTimer()
@@ -183,38 +393,118 @@ class MainWindow(QMainWindow):
         # 初始化第一组相机
         self.switch_camera_group()
         
-    def update_frame(self, frame, display):
+    def update_frame(self, frame, display, thread=None):
+        try:
+            self.show_frame(frame, display, thread)
+        finally:
+            # 绘制出错时也要归还预览预算, 否则这部分预算永远占用, 之后的预览帧都会被拒绝
+            if thread is not None:
+                thread.preview_done(frame)
+    
+    def show_frame(self, frame, display, thread=None):
         h, w = frame.shape[:2]
         display_w = display.width()
         display_h = display.height()
         scaling = min(display_w/w, display_h/h)
         new_w = int(w * scaling)
         new_h = int(h * scaling)
+        if new_w < 1 or new_h < 1:
+            # 窗口缩放过程中显示区域可能为0
+            return
         
         scaled_frame = cv2.resize(frame, (new_w, new_h))
+        if thread is not None and thread.roi is not None and not thread.driver_cropped:
+            draw_roi(scaled_frame, thread.roi, scaling)
         rgb_frame = cv2.cvtColor(scaled_frame, cv2.COLOR_BGR2RGB)
         h, w, ch = rgb_frame.shape
         bytes_per_line = ch * w
         qt_image = QImage(rgb_frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
         display.setPixmap(QPixmap.fromImage(qt_image))
         
-    def switch_camera_group(self):
-        # 暂停当前组的相机
-        current_devices = CAMERA_GROUPS[self.current_group]
-        for i, device in enumerate(['/dev/video0', '/dev/video2', '/dev/video4', 
-                                  '/dev/video6', '/dev/video8', '/dev/video10']):
-            if device in current_devices:
-                self.camera_threads[i].pause()
-        
-        # 切换到下一组
-        self.current_group = (self.current_group + 1) % len(CAMERA_GROUPS)
+    def on_tab_changed(self, index):
+        if index == 1 and self.gallery is None:
+            from gallery import GalleryTab
+            self.gallery = GalleryTab()
+            self.tabs.blockSignals(True)
+            self.tabs.removeTab(1)
+            self.tabs.insertTab(1, self.gallery, "Gallery")
+            self.tabs.setCurrentIndex(1)
+            self.tabs.blockSignals(False)
+            self.update_preview_rates()
+    
+    def update_metrics(self):
+        """刷新状态栏中的相机统计"""
+        profiler.report(expected=len(self.camera_threads))
+        # 部分平台不会为窗口被遮挡发送事件, 这里顺便定期检查
+        self.update_preview_rates()
+        parts = []
+        for thread in self.camera_threads:
+            m = thread.metrics
+            skipped = m['frames_skipped'] / m['frames'] if m['frames'] else 0.0
+            total = m['frames'] + m['frames_not_decoded']
+            decoded = m['frames'] / total if total else 0.0
+            parts.append(f"{thread.camera_name}: "
+                         f"change={m['change_score']:.1f} skip={skipped:.0%} decoded={decoded:.0%}")
+        parts.append(format_usage(default_budget().usage()))
+        self.metrics_label.setText("   ".join(parts))
+    
+    def preview_hidden(self):
+        handle = self.windowHandle()
+        return (not self.isVisible() or self.isMinimized() or self.tabs.currentIndex() != 0
+                or (handle is not None and not handle.isExposed()))
+    
+    def update_preview_rates(self):
+        """根据窗口可见性、前台状态和选中的画面设置每台相机的预览帧率"""
+        hidden = self.preview_hidden()
+        active = self.isActiveWindow()
+        for i, thread in enumerate(self.camera_threads):
+            if hidden:
+                fps = None
+            elif not active:
+                fps = PREVIEW_FPS_INACTIVE
+            elif self.displays[i].width() < MIN_TILE_WIDTH:
+                fps = PREVIEW_FPS_OTHERS
+            elif self.focused_index is None or self.focused_index == i:
+                fps = PREVIEW_FPS_FOCUSED
+            else:
+                fps = PREVIEW_FPS_OTHERS
+            thread.preview_interval = None if fps is None else (1.0 / fps if fps else 0.0)
+    
+    def eventFilter(self, obj, event):
+        if obj in self.displays:
+            if event.type() == QEvent.MouseButtonPress:
+                # 再次点击选中的画面取消选中, 所有画面恢复全速
+                index = self.displays.index(obj)
+                self.focused_index = None if self.focused_index == index else index
+                self.update_preview_rates()
+            elif event.type() == QEvent.Resize:
+                self.update_preview_rates()
+        return super().eventFilter(obj, event)
+    
+    def changeEvent(self, event):
+        if event.type() in (QEvent.WindowStateChange, QEvent.ActivationChange):
+            self.update_preview_rates()
+        super().changeEvent(event)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.update_preview_rates()
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.update_preview_rates()
         
-        # 启动下一组的相机
-        next_devices = CAMERA_GROUPS[self.current_group]
-        for i, device in enumerate(['/dev/video0', '/dev/video2', '/dev/video4', 
-                                  '/dev/video6', '/dev/video8', '/dev/video10']):
-            if device in next_devices:
-                self.camera_threads[i].resume()
+    def switch_camera_group(self):
+        """切换到下一组: 只有当前组的相机采集, 其他组全部暂停(只有一组时不做切换)"""
+        if not self.camera_groups:
+            return
+        self.current_group = (self.current_group + 1) % len(self.camera_groups)
+        for index, group in enumerate(self.camera_groups):
+            for i in group:
+                if index == self.current_group:
+                    self.camera_threads[i].resume()
+                else:
+                    self.camera_threads[i].pause()
         
     def save_all_frames(self):
         self.save_button.setEnabled(False)
@@ -223,16 +513,10 @@ class MainWindow(QMainWindow):
         # 暂停自动切换
         self.switch_timer.stop()
         
-        # 恢复所有相机
-        for thread in self.camera_threads:
-            thread.resume()
-        
-        # 等待相机初始化
-        time.sleep(1)
-        
-        # 开始保存
+        # 恢复所有相机并保存; 暂停的相机处于待机状态, 恢复后下一帧即可保存, 不用再等待初始化
         for thread in self.camera_threads:
             thread.save_flag = True
+            thread.resume()
         
     def on_save_completed(self):
         self.save_count += 1
@@ -244,12 +528,18 @@ class MainWindow(QMainWindow):
             
     def closeEvent(self, event):
         self.switch_timer.stop()
+        self.metrics_timer.stop()
+        if self.gallery is not None:
+            self.gallery.shutdown()
+        self.device_watcher.stop()
         for thread in self.camera_threads:
             thread.stop()
             thread.wait()
         super().closeEvent(event)
 
 if __name__ == '__main__':
+    profiler.mark_imports()
+    apply_role('gui')
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
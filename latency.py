@@ -0,0 +1,210 @@
+import json
+import time
+import random
+import argparse
+import cv2
+import numpy as np
+from capture_backend import open_capture
+from timelapse import percentile
+
+# 低延迟模式: 驱动队列只保留最少的缓冲区, 读取时丢掉队列中的旧帧, 只取最新一帧
+# 两个缓冲区: 一个由驱动填充, 一个等待读取; 只有一个时驱动要等我们还回缓冲区才能继续, 帧率会下降
+LOW_LATENCY_BUFFERS = 2
+LATENCY_RESULTS = "latency_results.json"
+
+
+def configure_low_latency(cap):
+    """尽量减少驱动缓冲区数量, 返回是否生效(不生效时只能靠read_latest丢弃旧帧)"""
+    if not cap.set(cv2.CAP_PROP_BUFFERSIZE, LOW_LATENCY_BUFFERS):
+        return False
+    return 0 < cap.get(cv2.CAP_PROP_BUFFERSIZE) <= LOW_LATENCY_BUFFERS
+
+
+def has_driver_queue(cap):
+    """相机驱动中是否有会积压旧帧的缓冲队列
+
+    回放和视频文件的grab总是立即返回下一帧, 按队列排空会把需要的帧全部丢掉。
+    后端可以用 driver_queue 属性声明, 没有声明时cv2只认V4L2后端
+    """
+    flag = getattr(cap, 'driver_queue', None)
+    if flag is not None:
+        return flag
+    try:
+        return cap.getBackendName() in ('V4L2', 'V4L')
+    except (cv2.error, AttributeError):
+        return False
+
+
+def read_latest(cap, max_drain=8):
+    """读取最新一帧, 丢弃队列中积压的旧帧; 没有驱动队列的后端直接读下一帧"""
+    if hasattr(cap, 'grab_latest'):
+        if not cap.grab_latest():
+            return False, None
+        return cap.retrieve()
+    if not has_driver_queue(cap):
+        return cap.read()
+
+    # 通用方法: 队列中已有的帧grab会立即返回, 一直grab到需要等待新帧为止;
+    # 某次grab等待过说明取到的是刚到达的新帧, 立即返回, 不再多等一帧
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    for i in range(max_drain + 1):
+        start = time.monotonic()
+        if not cap.grab():
+            if i == 0:
+                return False, None
+            break
+        if time.monotonic() - start > 0.5 / fps:
+            break
+    return cap.retrieve()
+
+
+def _brightness(frame):
+    """画面中央区域的平均亮度"""
+    h, w = frame.shape[:2]
+    center = frame[h // 4:h * 3 // 4, w // 4:w * 3 // 4]
+    if center.ndim == 3:
+        center = cv2.cvtColor(center, cv2.COLOR_BGR2GRAY)
+    return float(center.mean())
+
+
+class GlassToGlassTest:
+    """屏幕→相机→程序的端到端延迟测试
+
+    相机对准全屏显示的测试图案; 图案从黑变为带当前时间戳的白屏, 记录显示时间,
+    然后读帧直到相机看到亮度跳变。读帧方式和每帧处理耗时与实际预览循环一致,
+    所以结果包含驱动队列带来的延迟。
+    """
+
+    def __init__(self, cap, read=None, window="latency test", work_ms=0.0, seed=0):
+        self.cap = cap
+        self.read = read or cap.read
+        self.window = window
+        self.work_ms = work_ms          # 模拟每帧的处理耗时(缩放、转换、绘制)
+        self.random = random.Random(seed)
+        self.threshold = None
+
+    def _show(self, bright):
+        size = (720, 1280)
+        if bright:
+            image = np.full(size, 255, np.uint8)
+            cv2.putText(image, f"{time.monotonic() * 1000:.0f} ms", (40, 360),
+                        cv2.FONT_HERSHEY_SIMPLEX, 4, 0, 8)
+        else:
+            image = np.zeros(size, np.uint8)
+        cv2.imshow(self.window, image)
+        cv2.waitKey(1)
+        return time.monotonic()
+
+    def _next_brightness(self):
+        ret, frame = self.read()
+        if not ret:
+            raise RuntimeError("读取相机失败")
+        # 模拟处理耗时, 处理慢于帧率时积压的帧会体现在延迟中
+        if self.work_ms:
+            end = time.monotonic() + self.work_ms / 1000
+            while time.monotonic() < end:
+                pass
+        return _brightness(frame), frame
+
+    def _settle(self, seconds):
+        """持续读帧一段时间, 保持和预览循环相同的读取节奏, 返回最后的亮度"""
+        end = time.monotonic() + seconds
+        level = 0.0
+        while time.monotonic() < end:
+            level, _ = self._next_brightness()
+        return level
+
+    def calibrate(self):
+        """测量黑屏和白屏时的亮度, 取中点作为判定阈值"""
+        cv2.namedWindow(self.window, cv2.WINDOW_NORMAL)
+        cv2.setWindowProperty(self.window, cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+        self._show(False)
+        dark = self._settle(1.5)
+        self._show(True)
+        bright = self._settle(1.5)
+        if bright - dark < 20:
+            raise RuntimeError(f"亮度变化太小(黑 {dark:.0f} / 白 {bright:.0f}), 请让相机对准屏幕")
+        self.threshold = (dark + bright) / 2
+        return dark, bright
+
+    def run(self, trials=20, timeout=1.0):
+        """返回每次测量的延迟(毫秒), 超时未看到跳变的记为None"""
+        if self.threshold is None:
+            self.calibrate()
+        results = []
+        for _ in range(trials):
+            self._show(False)
+            # 随机等待, 避免闪烁与相机帧周期锁相
+            self._settle(self.random.uniform(0.4, 0.7))
+            shown = self._show(True)
+            latency = None
+            while time.monotonic() - shown < timeout:
+                level, _ = self._next_brightness()
+                if level > self.threshold:
+                    latency = (time.monotonic() - shown) * 1000
+                    break
+            results.append(latency)
+        cv2.destroyWindow(self.window)
+        return results
+
+
+def summarize(latencies):
+    values = [x for x in latencies if x is not None]
+    return {
+        'trials': len(latencies),
+        'misses': len(latencies) - len(values),
+        'mean_ms': sum(values) / len(values) if values else 0.0,
+        'p50_ms': percentile(values, 50),
+        'p95_ms': percentile(values, 95),
+        'max_ms': max(values) if values else 0.0,
+    }
+
+
+def measure_mode(device, mode, trials, work_ms, seed, resolution=(1280, 720)):
+    """按指定模式打开相机并测量; 每种模式都重新打开相机, 保证条件相同"""
+    cap = open_capture(device, standby=True)
+    if not cap.isOpened():
+        raise RuntimeError(f"无法打开相机 {device}")
+    try:
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, resolution[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, resolution[1])
+        if mode == 'latency':
+            configured = configure_low_latency(cap)
+            read = lambda: read_latest(cap)
+        else:
+            configured = False
+            read = cap.read
+        result = summarize(GlassToGlassTest(cap, read, work_ms=work_ms, seed=seed).run(trials))
+        result['mode'] = mode
+        result['buffers'] = cap.get(cv2.CAP_PROP_BUFFERSIZE)
+        result['driver_queue_configured'] = configured
+        return result
+    finally:
+        cap.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="屏幕到相机的端到端延迟测试, 比较吞吐模式和低延迟模式")
+    parser.add_argument("device", help="相机设备, 需要对准运行本程序的屏幕")
+    parser.add_argument("--trials", type=int, default=30)
+    parser.add_argument("--modes", nargs="+", choices=["throughput", "latency"],
+                        default=["throughput", "latency"])
+    parser.add_argument("--work-ms", type=float, default=0.0, help="模拟每帧的处理耗时")
+    parser.add_argument("--seed", type=int, default=0, help="闪烁间隔的随机种子, 固定后结果可复现")
+    parser.add_argument("--out", default=LATENCY_RESULTS)
+    args = parser.parse_args()
+
+    results = [measure_mode(args.device, mode, args.trials, args.work_ms, args.seed)
+               for mode in args.modes]
+    print(f"{'模式':<12}{'缓冲区':>8}{'平均':>10}{'p50':>10}{'p95':>10}{'最大':>10}{'丢失':>6}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['buffers']:>8.0f}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}"
+              f"{r['p95_ms']:>10.1f}{r['max_ms']:>10.1f}{r['misses']:>6}")
+    with open(args.out, "w") as f:
+        json.dump({'device': args.device, 'work_ms': args.work_ms, 'seed': args.seed,
+                   'results': results}, f, indent=2)
+    print(f"结果已写入 {args.out}")
+
+
+if __name__ == "__main__":
+    main()
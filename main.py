@@ -1,38 +1,29 @@
+import threading
 import cv2
-cap1=cv2.VideoCapture("/dev/video0")
-cap1.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # 设置宽度
-cap1.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-cap2=cv2.VideoCapture("/dev/video2")
-cap2.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # 设置宽度
-cap2.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+from multiplex_reader import MultiplexReader
 
-cap3=cv2.VideoCapture("/dev/video4")
-cap3.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # 设置宽度
-cap3.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+# 所有相机由一个epoll线程读取, 某台相机变慢或断线不会卡住其他相机的显示
+latest = {}
+lock = threading.Lock()
 
-cap4=cv2.VideoCapture("/dev/video6")
-cap4.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # 设置宽度
-cap4.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
 
-cap5=cv2.VideoCapture("/dev/video8")
-cap5.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # 设置宽度
-cap5.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
+def on_frame(name, timestamp, frame):
+    with lock:
+        latest[name] = frame
 
-cap6=cv2.VideoCapture("/dev/video10")
-cap6.set(cv2.CAP_PROP_FRAME_WIDTH, 1280)  # 设置宽度
-cap6.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-while(1):
-    ret,frame=cap1.read()
-    cv2.imshow("cap1",frame)
-    ret,frame=cap2.read()
-    cv2.imshow("cap2",frame)
-    ret,frame=cap3.read()
-    cv2.imshow("cap3",frame)
-    ret,frame=cap4.read()
-    cv2.imshow("cap4",frame)
 
-    ret,frame=cap5.read()
-    cv2.imshow("cap5",frame)
-    ret,frame=cap6.read()
-    cv2.imshow("cap6",frame)
-    cv2.waitKey(1)
+reader = MultiplexReader(resolution=(1280, 720), on_frame=on_frame)
+reader.start()
+try:
+    while(1):
+        with lock:
+            frames = dict(latest)
+            latest.clear()
+        # imshow只能在主线程调用
+        for name, frame in frames.items():
+            cv2.imshow(name, frame)
+        if cv2.waitKey(1) & 0xFF == 27:
+            break
+finally:
+    reader.stop()
+    cv2.destroyAllWindows()
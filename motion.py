@@ -0,0 +1,103 @@
+import time
+import cv2
+import numpy as np
+
+# 运动检测默认参数
+MOTION_SIZE = (80, 60)         # 分析用的降采样尺寸
+MOTION_PIXEL_THRESHOLD = 25    # 单像素灰度差阈值
+MOTION_AREA_THRESHOLD = 0.01   # 变化像素占比阈值
+MOTION_COOLDOWN = 2.0          # 两次触发的最小间隔(秒)
+
+
+def small_gray(frame, size=MOTION_SIZE):
+    """把一帧缩小为低分辨率灰度图(float32)"""
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small.astype(np.float32)
+
+
+def build_region_mask(regions, size=MOTION_SIZE):
+    """根据归一化区域列表 [(x0, y0, x1, y1), ...] 生成掩码, 无区域时返回None"""
+    if not regions:
+        return None
+    w, h = size
+    mask = np.zeros((h, w), dtype=bool)
+    for x0, y0, x1, y1 in regions:
+        mask[int(y0 * h):int(y1 * h), int(x0 * w):int(x1 * w)] = True
+    return mask
+
+
+class MotionDetector:
+    """基于低分辨率灰度帧差的运动检测, 用于自动触发拍照"""
+
+    def __init__(self, size=MOTION_SIZE, pixel_threshold=MOTION_PIXEL_THRESHOLD,
+                 area_threshold=MOTION_AREA_THRESHOLD, regions=None,
+                 cooldown=MOTION_COOLDOWN, alpha=0.2):
+        self.size = size
+        self.pixel_threshold = pixel_threshold
+        self.area_threshold = area_threshold
+        self.cooldown = cooldown
+        self.alpha = alpha  # 背景更新速度
+        self.mask = build_region_mask(regions, size)
+        self.background = None
+        self.last_trigger = 0.0
+        self.score = 0.0
+
+    def set_regions(self, regions):
+        """设置检测区域"""
+        self.mask = build_region_mask(regions, self.size)
+
+    def reset(self):
+        """清空背景(分辨率切换或拍照之后调用)"""
+        self.background = None
+        self.score = 0.0
+
+    def update(self, frame):
+        """输入一帧预览图像, 检测到运动且不在冷却期内时返回True"""
+        gray = small_gray(frame, self.size)
+        if self.background is None:
+            self.background = gray
+            return False
+
+        changed = np.abs(gray - self.background) > self.pixel_threshold
+        cv2.accumulateWeighted(gray, self.background, self.alpha)
+
+        if self.mask is not None:
+            changed = changed[self.mask]
+        self.score = float(changed.mean()) if changed.size else 0.0
+
+        now = time.monotonic()
+        if self.score >= self.area_threshold and now - self.last_trigger >= self.cooldown:
+            self.last_trigger = now
+            return True
+        return False
+
+
+class ChangeDetector:
+    """比较缩略签名判断画面是否变化, 用于跳过静止场景的重绘和重复保存"""
+
+    def __init__(self, size=(32, 18), threshold=2.0):
+        self.size = size
+        self.threshold = threshold  # 平均灰度差阈值
+        self.reference = None
+        self.score = 0.0
+
+    def reset(self):
+        """清空参考签名, 下一帧一定视为变化"""
+        self.reference = None
+
+    def update(self, frame):
+        """返回该帧相对于上一次变化帧是否有变化, 并更新score"""
+        signature = small_gray(frame, self.size)
+        if self.reference is None or self.reference.shape != signature.shape:
+            self.reference = signature
+            self.score = 255.0
+            return True
+
+        self.score = float(cv2.absdiff(signature, self.reference).mean())
+        if self.score >= self.threshold:
+            # 只在判定为变化时更新参考, 缓慢漂移也能累积触发
+            self.reference = signature
+            return True
+        return False
@@ -0,0 +1,332 @@
+import os
+import time
+import select
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+from v4l2_capture import V4L2Capture
+from device_watcher import DeviceWatcher, load_camera_list, camera_name
+from timelapse import percentile
+from thread_tuning import apply_role
+
+
+class _Camera:
+    def __init__(self, identity, path):
+        self.identity = identity
+        self.name = camera_name(identity)
+        self.path = path
+        self.cap = None
+        self.decoding = False   # 是否有一帧正在解码
+        self.pending = None     # 解码期间到达的最新一帧 (时间戳, 原始数据)
+        self.frames = 0
+        self.dropped = 0
+        self.last_time = None
+        self.gaps = []          # 相邻两帧出队的时间间隔(秒), 只在record_gaps时记录
+        self.fallback = None    # 不支持mmap数据流时单独读取这台相机的线程
+
+
+class MultiplexReader:
+    """单线程用epoll同时等待所有相机, 哪台相机的缓冲区就绪就读哪台, 解码交给线程池
+
+    每台相机同时最多只有一帧在解码; 解码期间到达的新帧只保留最新的一帧,
+    所以某台相机或解码变慢时只会丢帧, 不会拖慢其他相机或积压内存。
+    不支持mmap数据流的相机退回到cv2.VideoCapture, 由单独的线程阻塞读取。
+    """
+
+    def __init__(self, identities=None, resolution=(1280, 720), decode_workers=None, on_frame=None,
+                 record_gaps=False):
+        self.resolution = resolution
+        self.on_frame = on_frame   # on_frame(相机名, 时间戳, 帧), 在解码线程中调用
+        self.record_gaps = record_gaps  # 记录每个帧间隔用于测试, 长时间运行时不要打开
+        self.watcher = DeviceWatcher()
+        self.cameras = []
+        for identity in identities or load_camera_list():
+            camera = _Camera(identity, None)
+            camera.path = self.watcher.subscribe(identity, self._on_device_changed) or identity
+            self.cameras.append(camera)
+        self.by_fd = {}
+        self.pool = ThreadPoolExecutor(max_workers=decode_workers or min(len(self.cameras), os.cpu_count() or 1),
+                                       initializer=apply_role, initargs=('encode',))
+        self.lock = threading.Lock()
+        self.epoll = select.epoll()
+        self.wake_r, self.wake_w = os.pipe()
+        self.epoll.register(self.wake_r, select.EPOLLIN)
+        self.running = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def camera_names(self):
+        return [c.name for c in self.cameras]
+
+    def _on_device_changed(self, identity, path):
+        for camera in self.cameras:
+            if camera.identity == identity and path is not None:
+                camera.path = path
+        os.write(self.wake_w, b"x")
+
+    def _open(self, camera):
+        cap = V4L2Capture(camera.path)
+        if not cap.isOpened():
+            return self._open_fallback(camera)
+        try:
+            # 宽高一次协商, 逐项set会让驱动重新配置两次
+            cap.set_format(*self.resolution)
+        except OSError as e:
+            print(f"相机 {camera.name} 设置分辨率失败, 使用当前格式: {e}")
+        try:
+            cap.stream_on()
+        except OSError as e:
+            print(f"相机 {camera.name} 启动数据流失败: {e}")
+            cap.release()
+            return self._open_fallback(camera)
+        camera.cap = cap
+        self.by_fd[cap.fileno()] = camera
+        self.epoll.register(cap.fileno(), select.EPOLLIN)
+        return True
+
+    def _open_fallback(self, camera):
+        cap = cv2.VideoCapture(camera.path)
+        if not cap.isOpened():
+            cap.release()
+            return False
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.resolution[0])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.resolution[1])
+        print(f"相机 {camera.name} 不支持mmap数据流, 改用cv2单独读取")
+        camera.fallback = threading.Thread(target=self._read_fallback, args=(camera, cap), daemon=True)
+        camera.fallback.start()
+        return True
+
+    def _read_fallback(self, camera, cap):
+        # 读取失败时线程结束, 由epoll线程定时重新打开
+        while self.running:
+            ret, frame = cap.read()
+            if not ret:
+                print(f"相机 {camera.name} 读取失败, 等待重新连接")
+                break
+            now = self._count(camera)
+            if self.on_frame is not None:
+                self.on_frame(camera.name, now, frame)
+        cap.release()
+        camera.last_time = None
+        camera.fallback = None
+
+    def _close(self, camera):
+        fd = camera.cap.fileno()
+        self.epoll.unregister(fd)
+        del self.by_fd[fd]
+        camera.cap.release()
+        camera.cap = None
+        camera.last_time = None
+
+    def _missing(self):
+        return [c for c in self.cameras if c.cap is None and c.fallback is None]
+
+    def _reopen_missing(self):
+        for camera in self._missing():
+            if not self._open(camera):
+                print(f"无法打开相机 {camera.name} ({camera.path})")
+
+    def _decode(self, camera, cap, timestamp, raw):
+        while True:
+            try:
+                frame = cap.decode(raw)
+                if frame is not None and self.on_frame is not None:
+                    self.on_frame(camera.name, timestamp, frame)
+            except Exception as e:
+                # 线程池的Future没有人取结果, 异常不记录就会被吞掉; 出错的这一帧丢弃, 继续处理下一帧
+                print(f"相机 {camera.name} 解码或处理失败: {e!r}")
+            finally:
+                with self.lock:
+                    pending, camera.pending = camera.pending, None
+                    if pending is None:
+                        camera.decoding = False
+            if pending is None:
+                return
+            timestamp, raw = pending
+
+    def _count(self, camera):
+        now = time.monotonic()
+        if self.record_gaps and camera.last_time is not None:
+            camera.gaps.append(now - camera.last_time)
+        camera.last_time = now
+        camera.frames += 1
+        return now
+
+    def _dequeue(self, camera):
+        # 非阻塞出队, 缓冲区复制后立即还给驱动
+        if not camera.cap.grab(timeout=0):
+            return False
+        now = self._count(camera)
+        if len(camera.cap.raw) < camera.cap.min_frame_bytes():
+            # 驱动交回的缓冲区不完整(bytesused小于一帧的大小), 解码会出错
+            camera.dropped += 1
+            return True
+        with self.lock:
+            if camera.decoding:
+                if camera.pending is not None:
+                    camera.dropped += 1
+                camera.pending = (now, camera.cap.raw)
+                return True
+            camera.decoding = True
+        self.pool.submit(self._decode, camera, camera.cap, now, camera.cap.raw)
+        return True
+
+    def _run(self):
+        apply_role('capture')
+        self._reopen_missing()
+        last_retry = time.monotonic()
+        while self.running:
+            events = self.epoll.poll(1.0)
+            for fd, mask in events:
+                if fd == self.wake_r:
+                    os.read(self.wake_r, 4096)
+                    self._reopen_missing()
+                    continue
+                camera = self.by_fd.get(fd)
+                if camera is None:
+                    continue
+                if mask & (select.EPOLLERR | select.EPOLLHUP) or not self._dequeue(camera):
+                    print(f"相机 {camera.name} 读取失败, 等待重新连接")
+                    self._close(camera)
+            if time.monotonic() - last_retry > 5.0:
+                last_retry = time.monotonic()
+                if self._missing():
+                    self._reopen_missing()
+        for camera in self.cameras:
+            if camera.cap is not None:
+                self._close(camera)
+
+    def start(self):
+        self.running = True
+        self.watcher.start()
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        os.write(self.wake_w, b"x")
+        self.thread.join()
+        for camera in self.cameras:
+            fallback = camera.fallback
+            if fallback is not None:
+                fallback.join()
+        self.pool.shutdown()
+        self.watcher.stop()
+
+    def stats(self):
+        return {c.name: {'frames': c.frames, 'dropped': c.dropped, 'gaps': list(c.gaps)}
+                for c in self.cameras}
+
+
+class ThreadedReader:
+    """对比用: 每台相机一个线程阻塞读取并在本线程解码(GUI中的做法)"""
+
+    def __init__(self, identities=None, resolution=(1280, 720), on_frame=None):
+        self.identities = identities or load_camera_list()
+        self.resolution = resolution
+        self.on_frame = on_frame
+        self.running = False
+        self.counters = {camera_name(i): {'frames': 0, 'dropped': 0, 'gaps': []} for i in self.identities}
+        self.threads = [threading.Thread(target=self._run, args=(i,), daemon=True) for i in self.identities]
+
+    @property
+    def camera_names(self):
+        return [camera_name(i) for i in self.identities]
+
+    def _run(self, identity):
+        name = camera_name(identity)
+        counter = self.counters[name]
+        cap = V4L2Capture(identity)
+        if not cap.isOpened():
+            print(f"无法打开相机 {name}")
+            return
+        try:
+            cap.set_format(*self.resolution)
+        except OSError as e:
+            print(f"相机 {name} 设置分辨率失败, 使用当前格式: {e}")
+        last = None
+        while self.running:
+            ret, frame = cap.read()
+            if not ret:
+                # 设备出错时read会立即失败, 不要空转占满CPU
+                time.sleep(0.1)
+                continue
+            now = time.monotonic()
+            if last is not None:
+                counter['gaps'].append(now - last)
+            last = now
+            counter['frames'] += 1
+            if self.on_frame is not None:
+                self.on_frame(name, now, frame)
+        cap.release()
+
+    def start(self):
+        self.running = True
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        return {name: dict(c, gaps=list(c['gaps'])) for name, c in self.counters.items()}
+
+
+def benchmark(reader, seconds, work_ms=0.0):
+    """运行一段时间, 统计各相机帧率、帧间隔p99、CPU占用和线程数"""
+    def on_frame(name, timestamp, frame):
+        # 模拟下游处理(例如预览缩放)
+        if work_ms:
+            end = time.monotonic() + work_ms / 1000
+            while time.monotonic() < end:
+                pass
+    reader.on_frame = on_frame
+
+    reader.start()
+    time.sleep(1.0)  # 跳过启动阶段
+    base = {name: s['frames'] for name, s in reader.stats().items()}
+    base_gaps = {name: len(s['gaps']) for name, s in reader.stats().items()}
+    cpu_start, wall_start = time.process_time(), time.monotonic()
+    time.sleep(seconds)
+    cpu = time.process_time() - cpu_start
+    wall = time.monotonic() - wall_start
+    threads = threading.active_count()
+    stats = reader.stats()
+    reader.stop()
+
+    result = {'cpu_percent': cpu / wall * 100, 'threads': threads, 'cameras': {}}
+    for name, s in stats.items():
+        gaps = [g * 1000 for g in s['gaps'][base_gaps[name]:]]
+        result['cameras'][name] = {
+            'fps': (s['frames'] - base[name]) / wall,
+            'gap_p99_ms': percentile(gaps, 99),
+            'gap_max_ms': max(gaps) if gaps else 0.0,
+            'dropped': s['dropped'],
+        }
+    return result
+
+
+def print_benchmark(title, result):
+    print(f"{title}: CPU {result['cpu_percent']:.0f}%, 线程 {result['threads']}")
+    for name, c in result['cameras'].items():
+        print(f"  {name:<24} {c['fps']:6.1f} fps  帧间隔 p99 {c['gap_p99_ms']:6.1f} ms"
+              f" / 最大 {c['gap_max_ms']:6.1f} ms  解码丢帧 {c['dropped']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较epoll单线程读取和每相机一个线程读取")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="模拟每帧的下游处理耗时")
+    parser.add_argument("--decode-workers", type=int)
+    args = parser.parse_args()
+
+    print_benchmark("每相机一个线程", benchmark(ThreadedReader(), args.seconds, args.work_ms))
+    print_benchmark("epoll单线程 + 解码线程池",
+                    benchmark(MultiplexReader(decode_workers=args.decode_workers, record_gaps=True),
+                              args.seconds, args.work_ms))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import os
+import sys
+import json
+import mmap
+import time
+import threading
+import numpy as np
+
+# 录制格式: 每台相机两个文件
+#   <设备名>.frames  依次追加的原始帧数据
+#   <设备名>.jsonl   事件记录, 每行一个:
+#     {"t": 相对录制开始的秒数, "type": "frame", "offset": ..., "shape": [...], "dtype": "uint8"}
+#     {"t": ..., "type": "read_failed"} / {"t": ..., "type": "open_failed"} / {"t": ..., "type": "released"}
+# 录制到已有的目录时追加在原有记录之后, 时间t接着上次录制的最后一个事件继续
+
+
+def _last_event_time(path, tail=65536):
+    """已有事件文件中最后一个事件的时间, 文件不存在或为空时返回0"""
+    try:
+        with open(path, "rb") as f:
+            f.seek(max(0, os.path.getsize(path) - tail))
+            lines = f.read().splitlines()
+    except OSError:
+        return 0.0
+    for line in reversed(lines):
+        try:
+            return float(json.loads(line)["t"])
+        except (ValueError, KeyError, TypeError):
+            # 崩溃时可能只写了半行
+            continue
+    return 0.0
+
+
+def load_events(path):
+    """逐行读取事件文件; 跳过无法解析的行(录制崩溃后续录时留在文件中间的半行)"""
+    events = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(event, dict) and "t" in event and "type" in event:
+                events.append(event)
+    return events
+
+
+def device_name(device_path):
+    return device_path.split('/')[-1]
+
+
+class StreamRecorder:
+    """把一台相机的原始帧和读取失败事件写入磁盘"""
+
+    def __init__(self, directory, device_path):
+        os.makedirs(directory, exist_ok=True)
+        name = device_name(device_path)
+        events_path = os.path.join(directory, f"{name}.jsonl")
+        self.start = time.monotonic() - _last_event_time(events_path)
+        self.frames = open(os.path.join(directory, f"{name}.frames"), "ab")
+        self.events = open(events_path, "a", buffering=1)
+        if self.events.tell() > 0:
+            # 上次录制崩溃时最后一行可能不完整, 新记录从新的一行开始
+            with open(events_path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    self.events.write("\n")
+        self.lock = threading.Lock()
+
+    def _write_event(self, event):
+        event["t"] = round(time.monotonic() - self.start, 6)
+        self.events.write(json.dumps(event) + "\n")
+
+    def record_frame(self, frame):
+        with self.lock:
+            offset = self.frames.tell()
+            self.frames.write(np.ascontiguousarray(frame).data)
+            # 先把帧数据写入文件再写引用它的事件, 崩溃后事件不会指向没写完的数据
+            self.frames.flush()
+            self._write_event({"type": "frame", "offset": offset,
+                               "shape": list(frame.shape), "dtype": str(frame.dtype)})
+
+    def record_event(self, kind):
+        with self.lock:
+            self._write_event({"type": kind})
+
+    def close(self):
+        with self.lock:
+            self.frames.close()
+            self.events.close()
+
+
+_recorders = {}
+
+
+def get_recorder(directory, device_path):
+    """每台相机共用一个录制器, 相机重新打开后时间线保持连续"""
+    key = (directory, device_path)
+    if key not in _recorders:
+        _recorders[key] = StreamRecorder(directory, device_path)
+    return _recorders[key]
+
+
+class RecordingCapture:
+    """包装真实相机, 读取的同时录制
+
+    read()和retrieve()取到的帧都会录制, grab()/grab_latest()失败记为读取失败;
+    只出队不解码的帧没有图像数据, 不录制
+    """
+
+    def __init__(self, cap, recorder):
+        self.cap = cap
+        self.recorder = recorder
+        if not cap.isOpened():
+            recorder.record_event("open_failed")
+
+    def _record(self, ret, frame):
+        if ret:
+            self.recorder.record_frame(frame)
+        else:
+            self.recorder.record_event("read_failed")
+        return ret, frame
+
+    def _record_grab(self, ret):
+        if not ret:
+            self.recorder.record_event("read_failed")
+        return ret
+
+    def read(self):
+        return self._record(*self.cap.read())
+
+    def grab(self, *args, **kwargs):
+        return self._record_grab(self.cap.grab(*args, **kwargs))
+
+    def retrieve(self, *args, **kwargs):
+        return self._record(*self.cap.retrieve(*args, **kwargs))
+
+    def release(self):
+        self.cap.release()
+        self.recorder.record_event("released")
+
+    def __getattr__(self, name):
+        attr = getattr(self.cap, name)
+        if name == 'grab_latest':
+            # 只有底层相机提供grab_latest时才包装, read_latest用hasattr判断走哪条路径
+            return lambda *args, **kwargs: self._record_grab(attr(*args, **kwargs))
+        return attr
+
+
+class ReplaySession:
+    """一台相机的回放时间线; 相机关闭再打开后从当前时间继续, 不会从头开始"""
+
+    def __init__(self, directory, device_path, speed=1.0, disconnects=()):
+        name = device_name(device_path)
+        self.events = load_events(os.path.join(directory, f"{name}.jsonl"))
+        frames_path = os.path.join(directory, f"{name}.frames")
+        self.frames_file = open(frames_path, "rb")
+        size = os.path.getsize(frames_path)
+        self.frames = mmap.mmap(self.frames_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.speed = speed              # 1.0为实时, 大于1加速, 0为尽可能快
+        self.disconnects = list(disconnects)  # [(开始秒数, 持续秒数), ...], 录制时间线
+        self.position = 0
+        self.start = None
+        self.lock = threading.Lock()
+
+    def now(self):
+        """当前的录制时间线位置(秒)"""
+        if self.start is None:
+            self.start = time.monotonic()
+        if self.speed > 0:
+            return (time.monotonic() - self.start) * self.speed
+        # 尽可能快模式下以已回放事件的时间为准
+        if self.position < len(self.events):
+            return self.events[self.position]["t"]
+        return self.events[-1]["t"] if self.events else 0.0
+
+    def disconnected(self):
+        t = self.now()
+        return any(start <= t < start + duration for start, duration in self.disconnects)
+
+    def finished(self):
+        return self.position >= len(self.events)
+
+    def next_event(self):
+        """按录制节奏返回下一个事件, 播放完毕返回None"""
+        with self.lock:
+            if self.start is None:
+                self.start = time.monotonic()
+            # 跳过打开/关闭记录, 回放时由调用方自己决定何时重新打开
+            while not self.finished() and self.events[self.position]["type"] in ("open_failed", "released"):
+                self.position += 1
+            if self.finished():
+                return None
+            event = self.events[self.position]
+            self.position += 1
+        if self.speed > 0:
+            delay = event["t"] / self.speed - (time.monotonic() - self.start)
+            if delay > 0:
+                time.sleep(delay)
+        return event
+
+    def frame(self, event):
+        shape = event["shape"]
+        dtype = np.dtype(event["dtype"])
+        count = int(np.prod(shape))
+        data = np.frombuffer(self.frames, dtype=dtype, count=count, offset=event["offset"])
+        return data.reshape(shape).copy()
+
+
+_sessions = {}
+
+
+def get_session(directory, device_path, speed=1.0, disconnects=()):
+    key = (directory, device_path)
+    if key not in _sessions:
+        _sessions[key] = ReplaySession(directory, device_path, speed, disconnects)
+    return _sessions[key]
+
+
+class ReplayCapture:
+    """和cv2.VideoCapture接口相同的回放相机"""
+    driver_queue = False    # 按录制节奏给出每一帧, 没有积压的队列, read_latest不能排空
+
+    def __init__(self, session):
+        self.session = session
+        self.opened = not session.disconnected()
+        self.props = {}
+        self.last_frame = None
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        if not self.opened:
+            return False
+        if self.session.disconnected():
+            # 模拟拔线: 之后的读取全部失败, 直到调用方重新打开
+            self.opened = False
+            return False
+        event = self.session.next_event()
+        if event is None or event["type"] != "frame":
+            self.last_frame = None
+            return False
+        self.last_frame = self.session.frame(event)
+        return True
+
+    def retrieve(self):
+        return self.last_frame is not None, self.last_frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set(self, prop, value):
+        self.props[prop] = value
+        return True
+
+    def get(self, prop):
+        return self.props.get(prop, 0.0)
+
+    def release(self):
+        self.opened = False
+
+
+def parse_disconnects(text):
+    """解析 "10:2,30:0.5" 形式的断线时间表"""
+    if not text:
+        return []
+    result = []
+    for item in text.split(","):
+        start, duration = item.split(":")
+        result.append((float(start), float(duration)))
+    return result
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else "."
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".jsonl"):
+            continue
+        events = load_events(os.path.join(directory, filename))
+        frames = sum(1 for e in events if e["type"] == "frame")
+        failures = len(events) - frames
+        duration = events[-1]["t"] if events else 0.0
+        fps = frames / duration if duration else 0.0
+        print(f"{filename[:-6]:<10} {frames} 帧  {failures} 次失败  {duration:.1f} 秒  {fps:.1f} fps")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+import os
+import json
+import time
+import socket
+import argparse
+import socketserver
+import cv2
+from concurrent.futures import ThreadPoolExecutor
+from capture_engine import CaptureEngine
+from capture_archive import ArchiveWriter, session_path
+from save_pipeline import make_timestamp
+
+# 协议: 每条消息是一行JSON, 需要传图像时JSON中给出各段长度, 图像数据紧跟在该行之后
+#   {"cmd": "time"}                  -> {"t": 节点单调时钟}
+#   {"cmd": "capture", "at": 节点时钟上的触发时间}
+#                                    -> {"cameras": [{"name", "time", "size"}], "missing": [...]} + 图像数据
+DEFAULT_PORT = 9750
+JPEG_QUALITY = 95
+# 协调端等待节点应答的最长时间(秒), 需大于触发提前量加上节点的取帧超时; 超时的节点不再使用
+AGENT_TIMEOUT = 5.0
+
+
+def send_message(wfile, header, payload=b""):
+    wfile.write(json.dumps(header).encode() + b"\n")
+    if payload:
+        wfile.write(payload)
+    wfile.flush()
+
+
+def read_message(rfile):
+    line = rfile.readline()
+    if not line:
+        raise ConnectionError("连接已关闭")
+    return json.loads(line)
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    """处理协调端的请求"""
+
+    def handle(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        engine = self.server.engine
+        while True:
+            try:
+                message = read_message(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            # 尽早记录收到请求的时间, 减少时钟偏差估计误差
+            received = time.monotonic()
+            if message["cmd"] == "time":
+                send_message(self.wfile, {"t": received})
+            elif message["cmd"] == "capture":
+                delay = message["at"] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                frames, metadata = engine.capture_set(trigger=message["at"])
+                cameras, chunks = [], []
+                for name, frame in frames.items():
+                    ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+                    if not ok:
+                        metadata["missing"].append(name)
+                        continue
+                    chunks.append(data.tobytes())
+                    cameras.append({"name": name, "time": metadata["capture_times"][name],
+                                    "size": len(chunks[-1])})
+                send_message(self.wfile, {"cameras": cameras, "missing": metadata["missing"]},
+                             b"".join(chunks))
+            elif message["cmd"] == "cameras":
+                send_message(self.wfile, {"cameras": engine.camera_names})
+
+
+def run_agent(port, identities=None):
+    """节点端: 运行本机相机的采集引擎, 等待协调端触发"""
+    engine = CaptureEngine(identities)
+    engine.start()
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    server = socketserver.ThreadingTCPServer(("0.0.0.0", port), AgentHandler)
+    server.engine = engine
+    server.daemon_threads = True
+    print(f"节点已启动, 端口 {port}, 相机 {engine.camera_names}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        engine.stop()
+
+
+class AgentConnection:
+    """协调端到一个节点的连接, 保存该节点的时钟偏差"""
+
+    def __init__(self, address, timeout=AGENT_TIMEOUT):
+        host, _, port = address.partition(":")
+        self.name = address
+        # 超时同样作用于之后的每次读写, 一个节点卡住不会让协调端一直等待
+        self.sock = socket.create_connection((host, int(port or DEFAULT_PORT)), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.rfile = self.sock.makefile("rb")
+        self.wfile = self.sock.makefile("wb")
+        self.offset = 0.0   # 节点时钟 - 协调端时钟
+        self.rtt = None
+
+    def request(self, header):
+        send_message(self.wfile, header)
+        return read_message(self.rfile)
+
+    def sync_clock(self, samples=8):
+        """NTP方式估计时钟偏差: 取往返时间最短的一次, 假设去程和回程耗时相同"""
+        best = None
+        for _ in range(samples):
+            t0 = time.monotonic()
+            t1 = self.request({"cmd": "time"})["t"]
+            t3 = time.monotonic()
+            rtt = t3 - t0
+            if best is None or rtt < best[0]:
+                best = (rtt, t1 - (t0 + t3) / 2)
+        self.rtt, self.offset = best
+        return self.offset
+
+    def capture(self, trigger):
+        """在协调端时间trigger触发拍摄, 返回 ({相机名: jpeg数据}, {相机名: 协调端时间}, 缺失列表)"""
+        header = self.request({"cmd": "capture", "at": trigger + self.offset})
+        images, times = {}, {}
+        for camera in header["cameras"]:
+            data = self.rfile.read(camera["size"])
+            if len(data) != camera["size"]:
+                raise ConnectionError("图像数据不完整")
+            images[camera["name"]] = data
+            times[camera["name"]] = camera["time"] - self.offset
+        return images, times, header["missing"]
+
+    def close(self):
+        # makefile()返回的文件也持有连接, 要一起关闭; 连接已断开时写缓冲区flush可能失败
+        for f in (self.rfile, self.wfile):
+            try:
+                f.close()
+            except OSError:
+                pass
+        self.sock.close()
+
+
+class RigCoordinator:
+    """协调多个节点同步拍摄, 把所有节点的结果合并为一组"""
+
+    def __init__(self, addresses, resync_interval=60.0):
+        self.agents = []
+        self.failed = []    # 连接失败或中途出错的节点, 之后每组都记为缺失
+        for address in addresses:
+            try:
+                self.agents.append(AgentConnection(address))
+            except OSError as e:
+                print(f"无法连接节点 {address}: {e}")
+                self.failed.append(address)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, len(self.agents)))
+        self.resync_interval = resync_interval
+        self.last_sync = 0.0
+
+    def _drop(self, agent, error):
+        """出错的节点流中可能残留半条消息, 不能继续使用: 关闭连接并移出列表"""
+        print(f"节点 {agent.name} 出错, 不再使用: {error}")
+        agent.close()
+        self.agents.remove(agent)
+        self.failed.append(agent.name)
+
+    def sync_clocks(self):
+        for agent in list(self.agents):
+            try:
+                agent.sync_clock()
+            except (OSError, ValueError, KeyError) as e:
+                self._drop(agent, e)
+                continue
+            print(f"节点 {agent.name}: 时钟偏差 {agent.offset * 1000:+.3f} ms, "
+                  f"往返 {agent.rtt * 1000:.3f} ms")
+        self.last_sync = time.monotonic()
+
+    def capture_set(self, lead_time=0.1):
+        """在lead_time秒之后的同一时刻触发所有节点, 返回 ({节点/相机: jpeg数据}, 元数据)"""
+        if time.monotonic() - self.last_sync > self.resync_interval:
+            self.sync_clocks()
+        trigger = time.monotonic() + lead_time
+        futures = {agent: self.pool.submit(agent.capture, trigger) for agent in self.agents}
+
+        images, times, missing = {}, {}, list(self.failed)
+        for agent, future in futures.items():
+            node = agent.name
+            try:
+                node_images, node_times, node_missing = future.result()
+            except (OSError, ValueError, KeyError) as e:
+                self._drop(agent, e)
+                missing.append(node)
+                continue
+            for name, data in node_images.items():
+                images[f"{node}/{name}"] = data
+                times[f"{node}/{name}"] = node_times[name]
+            missing.extend(f"{node}/{name}" for name in node_missing)
+
+        metadata = {
+            'trigger': trigger,
+            'capture_times': times,
+            'skew': max(times.values()) - min(times.values()) if times else 0.0,
+            'missing': missing,
+            'clock_offsets': {a.name: a.offset for a in self.agents},
+        }
+        return images, metadata
+
+    def close(self):
+        self.pool.shutdown()
+        for agent in self.agents:
+            agent.close()
+
+
+def safe_name(name):
+    return name.replace("/", "-").replace(":", "_")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多机相机阵列: 节点/协调端")
+    sub = parser.add_subparsers(dest="command", required=True)
+    agent = sub.add_parser("agent", help="在本机运行节点")
+    agent.add_argument("--port", type=int, default=DEFAULT_PORT)
+    agent.add_argument("--cameras", nargs="*", help="相机标识, 默认读取 cameras.json")
+    coord = sub.add_parser("coordinate", help="触发所有节点同步拍摄")
+    coord.add_argument("agents", nargs="+", help="节点地址 host:port")
+    coord.add_argument("--count", type=int, default=1)
+    coord.add_argument("--interval", type=float, default=1.0)
+    coord.add_argument("--out", default=".")
+    coord.add_argument("--archive", action="store_true", help="写入分片文件而不是单独的jpg")
+    args = parser.parse_args()
+
+    if args.command == "agent":
+        run_agent(args.port, args.cameras)
+        return
+
+    coordinator = RigCoordinator(args.agents)
+    archive = ArchiveWriter(session_path(args.out), flush_every=1) if args.archive else None
+    try:
+        for i in range(args.count):
+            images, metadata = coordinator.capture_set()
+            if archive is not None:
+                archive.append({name: (data, ".jpg") for name, data in images.items()}, metadata)
+            else:
+                timestamp = make_timestamp()
+                for name, data in images.items():
+                    filename = os.path.join(args.out, f"camera_{safe_name(name)}_{timestamp}.jpg")
+                    with open(filename, "wb") as f:
+                        f.write(data)
+            print(f"第 {i + 1} 组: {len(images)} 张, 偏差 {metadata['skew'] * 1000:.1f} ms, "
+                  f"缺失 {metadata['missing']}")
+            if i + 1 < args.count:
+                time.sleep(args.interval)
+    finally:
+        coordinator.close()
+        if archive is not None:
+            archive.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import re
+import json
+import subprocess
+import cv2
+
+# 每台相机的感兴趣区域, 坐标为保存分辨率下的 (x, y, w, h):
+# {"video0": [320, 180, 640, 360], "video2": [0, 0, 1280, 720]}
+ROI_CONFIG = "roi.json"
+
+# v4l2-ctl --get-selection 的输出, 例如 "Selection Crop: Left 0, Top 0, Width 1280, Height 720, Flags: "
+SELECTION_PATTERN = re.compile(r"Left (-?\d+), Top (-?\d+), Width (\d+), Height (\d+)")
+
+
+def load_rois(path=ROI_CONFIG):
+    """读取ROI配置, 文件不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return {name: tuple(roi) for name, roi in json.load(f).items()}
+    except (OSError, ValueError) as e:
+        print(f"读取ROI配置失败 {path}: {e}")
+        return {}
+
+
+def crop(frame, roi):
+    """按ROI截取, 返回原帧上的视图(不拷贝)"""
+    if roi is None:
+        return frame
+    x, y, w, h = roi
+    return frame[y:y + h, x:x + w]
+
+
+def _v4l2_ctl(device_path, *args):
+    try:
+        return subprocess.run(['v4l2-ctl', '-d', device_path, *args], capture_output=True, text=True)
+    except Exception as e:
+        print(f"v4l2-ctl error for {device_path}: {e}")
+        return None
+
+
+def get_driver_crop(device_path):
+    """读取驱动当前的裁剪区域 (x, y, w, h), 不支持裁剪时返回None"""
+    result = _v4l2_ctl(device_path, '--get-selection=target=crop')
+    if result is None or result.returncode != 0:
+        return None
+    match = SELECTION_PATTERN.search(result.stdout)
+    return tuple(int(v) for v in match.groups()) if match else None
+
+
+def set_driver_crop(device_path, rect):
+    """设置驱动裁剪区域, 读回的区域与要求一致时返回True; 数据流运行时驱动通常会拒绝(EBUSY)"""
+    x, y, w, h = rect
+    result = _v4l2_ctl(device_path, f'--set-selection=target=crop,left={x},top={y},width={w},height={h}')
+    # 退出码为0不代表生效, 驱动可能把区域调整为它支持的值
+    return result is not None and result.returncode == 0 and get_driver_crop(device_path) == tuple(rect)
+
+
+def apply_driver_crop(device_path, roi):
+    """尝试让驱动直接输出ROI区域(V4L2 selection), 必须在开始数据流之前调用
+
+    成功时返回原来的裁剪区域(用于恢复), 失败返回None。驱动可能把裁剪区域缩放回协商的分辨率,
+    所以调用方还要确认读到的帧尺寸等于ROI, 否则恢复原来的区域并改用软件裁剪
+    """
+    previous = get_driver_crop(device_path)
+    # 大多数UVC相机不支持裁剪, 此时退回到软件裁剪
+    if previous is None:
+        return None
+    if not set_driver_crop(device_path, roi):
+        if get_driver_crop(device_path) != previous:
+            set_driver_crop(device_path, previous)
+        return None
+    return previous
+
+
+def draw_roi(frame, roi, scale=1.0, color=(0, 255, 0)):
+    """在预览图上画出ROI框"""
+    x, y, w, h = roi
+    cv2.rectangle(frame,
+                  (int(x * scale), int(y * scale)),
+                  (int((x + w) * scale) - 1, int((y + h) * scale) - 1),
+                  color, 2)
+    return frame
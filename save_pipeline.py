@@ -0,0 +1,145 @@
+import os
+import time
+from roi import crop
+from encoders import get_encoder, encode_set
+from frame_budget import frame_bytes
+from thread_tuning import apply_role
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, Future
+
+
+# 保存队列超出内存预算时, 提交方最多等待这么久(整组合计), 超时则放弃这一组
+BUDGET_TIMEOUT = 5.0
+
+
+def make_timestamp():
+    """生成保存文件使用的时间戳, 精确到毫秒: 后台保存时同一秒内可能提交多组, 只到秒会互相覆盖"""
+    return datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class SavePipeline:
+    """后台保存: 采集线程只提交帧, 校正、编码和写盘都在后台线程池完成"""
+
+    def __init__(self, output_dir=".", workers=None, rois=None, archive=None, catalog=None, encoder=None,
+                 budget=None):
+        self.output_dir = output_dir
+        self.budget = budget    # FrameBudget, 排队等待保存的帧从 'save' 池申请内存
+        self.encoder = encoder or get_encoder()  # encoders.Encoder, 决定文件格式和压缩参数
+        self.rois = rois or {}  # {相机名: (x, y, w, h)}, 编码前裁剪
+        self.archive = archive  # ArchiveWriter, 设置后整组写入分片文件而不是单独的jpg
+        self.catalog = catalog  # CaptureCatalog, 设置后每组保存结果登记到数据库
+        workers = workers or min(6, os.cpu_count() or 1)
+        self.write_pool = ThreadPoolExecutor(max_workers=workers, initializer=apply_role, initargs=('encode',))
+        # 整组处理(批量校正等)单独一个线程, 避免与写盘任务互相等待
+        self.set_pool = ThreadPoolExecutor(max_workers=1, initializer=apply_role, initargs=('encode',))
+
+    def make_filename(self, camera_name, timestamp):
+        return os.path.join(self.output_dir, f"camera_{camera_name}_{timestamp}{self.encoder.ext}")
+
+    def _save(self, camera_name, frame, timestamp):
+        """保存单帧, 返回 (相机名, 文件名, 是否成功)"""
+        filename = self.make_filename(camera_name, timestamp)
+        frame = crop(frame, self.rois.get(camera_name))
+        try:
+            ok = self.encoder.save(filename, frame)
+        except Exception as e:
+            print(f"保存 {filename} 失败: {e}")
+            ok = False
+        return camera_name, filename, ok
+
+    def _reserve(self, frames, timeout=BUDGET_TIMEOUT):
+        """为排队的帧申请预算, 整组共用timeout秒; 失败时退还已申请的部分"""
+        if self.budget is None:
+            return True
+        deadline = time.monotonic() + timeout
+        reserved = []
+        for name, frame in frames.items():
+            remaining = max(0.0, deadline - time.monotonic())
+            if not self.budget.acquire('save', name, frame_bytes(frame), remaining):
+                self._unreserve(dict(reserved))
+                print(f"保存队列超出内存预算, 放弃保存 {', '.join(frames)}")
+                return False
+            reserved.append((name, frame))
+        return True
+
+    def _unreserve(self, frames):
+        if self.budget is not None:
+            for name, frame in frames.items():
+                self.budget.release('save', name, frame_bytes(frame))
+
+    def _save_reserved(self, camera_name, frame, timestamp):
+        try:
+            return self._save(camera_name, frame, timestamp)
+        finally:
+            self._unreserve({camera_name: frame})
+
+    def submit(self, camera_name, frame, timestamp=None, budget_timeout=BUDGET_TIMEOUT):
+        """异步保存单帧, 返回Future"""
+        timestamp = timestamp or make_timestamp()
+        if not self._reserve({camera_name: frame}, budget_timeout):
+            return _completed((camera_name, None, False))
+        return self.write_pool.submit(self._save_reserved, camera_name, frame, timestamp)
+
+    def _archive_set(self, frames, metadata):
+        """并行编码后把整组追加到分片文件, 写盘在本线程内顺序进行"""
+        cropped = {name: crop(frame, self.rois.get(name)) for name, frame in frames.items()}
+        images, failed = {}, []
+        for name, data in encode_set(self.encoder, cropped, self.write_pool).items():
+            if data is None:
+                failed.append(name)
+            else:
+                images[name] = (data, self.encoder.ext)
+        meta = dict(metadata or {})
+        meta["failed"] = failed
+        set_id = self.archive.append(images, meta)
+        location = f"{self.archive.path}.cset#{set_id}"
+        results = [(name, location, name in images) for name in frames]
+        return results, {name: len(data) for name, (data, _) in images.items()}
+
+    def _save_set(self, frames, timestamp, correction, metadata):
+        try:
+            return self._save_set_reserved(frames, timestamp, correction, metadata)
+        finally:
+            self._unreserve(frames)
+
+    def _save_set_reserved(self, frames, timestamp, correction, metadata):
+        start = time.monotonic()
+        if correction is not None:
+            frames = correction.apply_set(frames)
+        if self.archive is not None:
+            results, sizes = self._archive_set(frames, metadata)
+        else:
+            futures = [self.write_pool.submit(self._save, name, frame, timestamp)
+                       for name, frame in frames.items()]
+            results = [f.result() for f in futures]
+            sizes = {name: os.path.getsize(filename) for name, filename, ok in results if ok}
+        if self.catalog is not None:
+            self.catalog.register_set(time.time(), results, sizes, metadata,
+                                      time.monotonic() - start)
+        return results
+
+    def submit_set(self, frames, timestamp=None, correction=None, metadata=None, budget_timeout=BUDGET_TIMEOUT):
+        """异步保存一组帧 {相机名: 帧}, 可选先做整组校正; Future结果为每台相机的保存结果列表
+
+        超出内存预算时在调用线程中最多等待budget_timeout秒; 定时调度等不能阻塞的调用方传0, 立即放弃这一组
+        """
+        timestamp = timestamp or make_timestamp()
+        frames = dict(frames)
+        if not self._reserve(frames, budget_timeout):
+            return _completed([(name, None, False) for name in frames])
+        return self.set_pool.submit(self._save_set, frames, timestamp, correction, metadata)
+
+    def close(self):
+        """等待所有保存任务完成"""
+        self.set_pool.shutdown(wait=True)
+        self.write_pool.shutdown(wait=True)
+        if self.archive is not None:
+            self.archive.close()
+        if self.catalog is not None:
+            self.catalog.close()
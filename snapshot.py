@@ -0,0 +1,100 @@
+import os
+import time
+import argparse
+import threading
+import cv2
+from v4l2_capture import V4L2Capture, PIX_FMT_MJPG
+from device_watcher import load_camera_list, camera_name, resolve
+from save_pipeline import make_timestamp
+from encoders import get_encoder
+from startup_profile import profiler
+
+# 无界面单次拍摄: 不导入Qt, 不启动设备监视和后台线程池, 所有相机并行打开,
+# 相机输出MJPG时直接把第一帧的压缩数据写盘, 不解码也不重新编码
+# CAPTURE_PROFILE_STARTUP=1 python snapshot.py 可以查看各阶段耗时
+
+
+def capture_one(identity, resolution, out_dir, timestamp, warmup=0, reencode=False):
+    """拍摄一台相机, 返回保存的文件名, 失败返回None"""
+    name = camera_name(identity)
+    with profiler.phase(name, 'open'):
+        cap = V4L2Capture(resolve(identity) or identity, buffer_count=2)
+    if not cap.isOpened():
+        print(f"无法打开相机 {name}")
+        return None
+    try:
+        with profiler.phase(name, 'format'):
+            cap.set_format(resolution[0], resolution[1], PIX_FMT_MJPG)
+        with profiler.phase(name, 'controls'):
+            # 用ioctl直接设置, 不再为每台相机启动v4l2-ctl进程
+            cap.set(cv2.CAP_PROP_AUTO_EXPOSURE, 3)
+            cap.set(cv2.CAP_PROP_AUTO_WB, 1)
+        with profiler.phase(name, 'first_frame'):
+            ok = cap.grab()
+        # 自动曝光需要几帧才能稳定, 需要时多丢几帧
+        for _ in range(warmup):
+            ok = cap.grab()
+        if not ok:
+            print(f"相机 {name} 读取失败")
+            return None
+
+        if cap.get(cv2.CAP_PROP_FOURCC) == PIX_FMT_MJPG and not reencode:
+            data, ext = cap.raw, ".jpg"
+        else:
+            # 相机不支持MJPG或要求重新编码时才解码
+            encoder = get_encoder()
+            ok, frame = cap.retrieve()
+            data = encoder.encode(frame) if ok else None
+            ext = encoder.ext
+        if data is None:
+            print(f"相机 {name} 编码失败")
+            return None
+        filename = os.path.join(out_dir, f"camera_{name}_{timestamp}{ext}")
+        with open(filename, "wb") as f:
+            f.write(data)
+        return filename
+    finally:
+        cap.release()
+
+
+def snapshot(identities, resolution=(1280, 720), out_dir=".", warmup=0, reencode=False):
+    """所有相机并行拍摄一次, 返回 {相机名: 文件名或None}"""
+    timestamp = make_timestamp()
+    results = {}
+
+    def run(identity):
+        results[camera_name(identity)] = capture_one(identity, resolution, out_dir, timestamp,
+                                                     warmup, reencode)
+
+    threads = [threading.Thread(target=run, args=(identity,)) for identity in identities]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def main():
+    profiler.mark_imports()
+    start = time.perf_counter()
+    parser = argparse.ArgumentParser(description="无界面单次拍摄所有相机")
+    parser.add_argument("cameras", nargs="*", help="相机标识, 默认读取 cameras.json")
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--warmup", type=int, default=0, help="保存前丢弃的帧数, 让自动曝光稳定")
+    parser.add_argument("--reencode", action="store_true", help="解码后用encoders重新编码, 不直接保存MJPG数据")
+    args = parser.parse_args()
+
+    identities = args.cameras or load_camera_list()
+    results = snapshot(identities, (args.width, args.height), args.out, args.warmup, args.reencode)
+    for name, filename in results.items():
+        if filename:
+            print(f"已保存 {filename}")
+    profiler.report()
+    saved = sum(1 for f in results.values() if f)
+    print(f"{saved}/{len(results)} 台相机, 用时 {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+# CAPTURE_PROFILE_STARTUP=1 时记录启动各阶段耗时, 第一帧到达后打印:
+#   import   进程启动到开始打开相机(解释器启动 + 模块导入)
+#   open     打开设备
+#   format   分辨率/像素格式协商
+#   controls 曝光、白平衡等控制项
+#   first_frame 开始数据流到拿到第一帧
+PROFILE_STARTUP = os.environ.get("CAPTURE_PROFILE_STARTUP") == "1"
+PHASES = ('open', 'format', 'controls', 'first_frame')
+
+
+def process_uptime():
+    """进程已运行的时间(秒), 包括解释器启动; 无法读取时返回0"""
+    try:
+        with open("/proc/self/stat") as f:
+            # 第22个字段是进程启动时间(开机后的时钟周期数), comm字段可能含空格, 从右括号之后开始数
+            fields = f.read().rsplit(")", 1)[1].split()
+        start = int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0]) - start
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class StartupProfiler:
+    """按相机记录启动阶段耗时"""
+
+    def __init__(self, enabled=PROFILE_STARTUP):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.imports = None
+        self.phases = {}        # 相机名 -> {阶段: 秒}
+        self.first_frame = {}   # 相机名 -> 进程启动到第一帧的秒数
+        self.reported = False
+
+    def mark_imports(self):
+        """在入口模块导入完成、开始打开相机前调用"""
+        if self.enabled and self.imports is None:
+            self.imports = process_uptime()
+
+    @contextmanager
+    def phase(self, camera, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                phases = self.phases.setdefault(camera, {})
+                phases[name] = phases.get(name, 0.0) + elapsed
+                if name == 'first_frame' and camera not in self.first_frame:
+                    self.first_frame[camera] = process_uptime()
+
+    def report(self, expected=None):
+        """打印各阶段耗时; expected给出相机数量时, 等所有相机都出第一帧后才打印(只打印一次)"""
+        if not self.enabled:
+            return
+        with self.lock:
+            if self.reported or (expected is not None and len(self.first_frame) < expected):
+                return
+            self.reported = True
+            phases = dict(self.phases)
+            first_frame = dict(self.first_frame)
+        print(f"启动耗时: 导入 {self.imports * 1000 if self.imports else 0:.0f} ms")
+        print(f"  {'相机':<20}" + "".join(f"{name:>13}" for name in PHASES) + f"{'第一帧':>10}")
+        for camera, times in phases.items():
+            row = "".join(f"{times[name] * 1000:>10.0f} ms" if name in times else f"{'-':>13}"
+                          for name in PHASES)
+            ready = first_frame.get(camera)
+            print(f"  {camera:<20}{row}" + (f"{ready * 1000:>7.0f} ms" if ready else f"{'-':>10}"))
+        if first_frame:
+            print(f"  进程启动到所有相机出图: {max(first_frame.values()) * 1000:.0f} ms")
+
+
+profiler = StartupProfiler()
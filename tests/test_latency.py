@@ -0,0 +1,31 @@
+import numpy as np
+from latency import read_latest
+from replay import StreamRecorder, ReplaySession, ReplayCapture, RecordingCapture
+
+
+def _record(directory, count):
+    recorder = StreamRecorder(directory, "/dev/video0")
+    for i in range(count):
+        recorder.record_frame(np.full((4, 6, 3), i, np.uint8))
+    recorder.close()
+
+
+def test_read_latest_keeps_every_replayed_frame(tmp_path):
+    _record(str(tmp_path), 12)
+    cap = ReplayCapture(ReplaySession(str(tmp_path), "/dev/video0", speed=0))
+    values = []
+    while True:
+        ret, frame = read_latest(cap)
+        if not ret:
+            break
+        values.append(int(frame[0, 0, 0]))
+    assert values == list(range(12))
+
+
+def test_read_latest_through_recording_wrapper(tmp_path):
+    # 回放的同时再录制(包装后的相机)也不能丢帧
+    _record(str(tmp_path / "in"), 5)
+    cap = RecordingCapture(ReplayCapture(ReplaySession(str(tmp_path / "in"), "/dev/video0", speed=0)),
+                           StreamRecorder(str(tmp_path / "out"), "/dev/video0"))
+    values = [int(read_latest(cap)[1][0, 0, 0]) for _ in range(5)]
+    assert values == list(range(5))
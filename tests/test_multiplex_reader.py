@@ -0,0 +1,29 @@
+import threading
+from multiplex_reader import MultiplexReader, _Camera
+
+
+class _BrokenCap:
+    def decode(self, raw):
+        if raw == b"bad":
+            raise ValueError("corrupt buffer")
+        return raw
+
+
+def test_decode_error_does_not_stall_camera():
+    reader = MultiplexReader.__new__(MultiplexReader)
+    reader.lock = threading.Lock()
+    seen = []
+    reader.on_frame = lambda name, timestamp, frame: seen.append(frame)
+    camera = _Camera("/dev/video0", "/dev/video0")
+    cap = _BrokenCap()
+
+    camera.decoding = True
+    camera.pending = (2.0, b"good")
+    reader._decode(camera, cap, 1.0, b"bad")
+    # 出错的一帧丢弃, 解码期间到达的帧照常处理, 之后可以再次提交
+    assert seen == [b"good"]
+    assert camera.decoding is False
+
+    camera.decoding = True
+    reader._decode(camera, cap, 3.0, b"bad")
+    assert camera.decoding is False
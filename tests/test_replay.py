@@ -0,0 +1,36 @@
+import os
+import numpy as np
+from replay import StreamRecorder, ReplaySession, ReplayCapture, load_events
+
+
+def _frame(value):
+    return np.full((4, 6, 3), value, np.uint8)
+
+
+def test_resume_after_truncated_line_replays(tmp_path):
+    directory = str(tmp_path)
+    recorder = StreamRecorder(directory, "/dev/video0")
+    recorder.record_frame(_frame(1))
+    recorder.close()
+    # 模拟录制崩溃: 最后一行只写了一半
+    with open(os.path.join(directory, "video0.jsonl"), "a") as f:
+        f.write('{"t": 9.5, "type": "fr')
+
+    recorder = StreamRecorder(directory, "/dev/video0")
+    recorder.record_frame(_frame(2))
+    recorder.record_event("read_failed")
+    recorder.close()
+
+    events = load_events(os.path.join(directory, "video0.jsonl"))
+    assert [e["type"] for e in events] == ["frame", "frame", "read_failed"]
+    times = [e["t"] for e in events]
+    assert times == sorted(times)
+
+    cap = ReplayCapture(ReplaySession(directory, "/dev/video0", speed=0))
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame)
+    assert [int(f[0, 0, 0]) for f in frames] == [1, 2]
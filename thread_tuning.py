@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import argparse
+import threading
+import multiprocessing
+
+# 按线程角色设置CPU亲和性和调度策略, 配置文件 threads.json, 例如:
+# {
+#   "capture": {"cpus": [2, 3], "policy": "fifo", "priority": 10},
+#   "encode":  {"cpus": [4, 5, 6, 7], "nice": 5},
+#   "gui":     {"cpus": [0, 1]}
+# }
+# capture: 相机读取线程; encode: 编解码/写盘线程池; gui: Qt主线程;
+# background: 设备监视、写数据库等辅助线程
+# 没有配置文件时不做任何设置。Linux上新线程继承创建者的CPU和调度策略,
+# 所以有配置文件时, 角色中没有配置的项恢复为进程启动时的设置(不绑核、SCHED_OTHER、原nice值)
+THREAD_CONFIG = "threads.json"
+ROLES = ('capture', 'encode', 'gui', 'background')
+
+_config = None
+_failures = []          # (角色, 设置项, 错误)
+_applied = {}           # 角色 -> 成功应用的线程数
+_lock = threading.Lock()
+
+
+def _initial_settings():
+    """导入时(还没有线程调用apply_role)记录进程的CPU集合和nice值"""
+    try:
+        cpus = os.sched_getaffinity(0)
+    except (OSError, AttributeError):
+        cpus = None
+    try:
+        nice = os.getpriority(os.PRIO_PROCESS, 0)
+    except (OSError, AttributeError):
+        nice = None
+    return cpus, nice
+
+
+_default_cpus, _default_nice = _initial_settings()
+
+
+def load_thread_config(path=THREAD_CONFIG):
+    """读取线程配置, 文件不存在时返回空字典"""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取线程配置失败 {path}: {e}")
+        return {}
+
+
+def _load_config():
+    global _config
+    with _lock:
+        if _config is None:
+            _config = load_thread_config()
+        return _config
+
+
+def configure(config):
+    """直接指定配置(测试或命令行使用), 代替 threads.json"""
+    global _config
+    with _lock:
+        _config = config
+
+
+def _fail(role, setting, error):
+    with _lock:
+        # 同一角色的多个线程失败原因相同, 只记录一次
+        if not any(r == role and s == setting for r, s, _ in _failures):
+            _failures.append((role, setting, str(error)))
+            print(f"线程设置未生效 [{role}] {setting}: {error}")
+
+
+def apply_role(role):
+    """在线程内调用, 把当前线程设置为角色对应的CPU和调度策略, 返回是否全部成功
+
+    sched_setaffinity/sched_setscheduler 的pid为0时只作用于调用线程;
+    nice值按线程ID设置(Linux上每个线程有独立的nice值)。
+    线程池的工作线程在submit()的调用线程中创建, 会继承调用线程的实时调度,
+    所以没有配置policy时要显式恢复为SCHED_OTHER, 否则nice不起作用
+    """
+    all_config = _load_config()
+    if not all_config:
+        return True
+    config = all_config.get(role) or {}
+    ok = True
+    cpus = config.get('cpus') or _default_cpus
+    if cpus:
+        try:
+            os.sched_setaffinity(0, cpus)
+        except (OSError, AttributeError, ValueError) as e:
+            _fail(role, f"cpus={sorted(cpus)}", e)
+            ok = False
+    policy = config.get('policy')
+    try:
+        if policy in ('fifo', 'rr'):
+            sched = os.SCHED_FIFO if policy == 'fifo' else os.SCHED_RR
+            os.sched_setscheduler(0, sched, os.sched_param(config.get('priority', 10)))
+        else:
+            os.sched_setscheduler(0, os.SCHED_OTHER, os.sched_param(0))
+    except (OSError, AttributeError) as e:
+        # 通常是缺少 CAP_SYS_NICE 或 RLIMIT_RTPRIO 为0
+        _fail(role, f"policy={policy or 'other'}", e)
+        ok = False
+    nice = config.get('nice', _default_nice)
+    if nice is not None:
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+        except (OSError, AttributeError) as e:
+            _fail(role, f"nice={nice}", e)
+            ok = False
+    if ok:
+        with _lock:
+            _applied[role] = _applied.get(role, 0) + 1
+    return ok
+
+
+def tuning_report():
+    """已应用的角色线程数和未能生效的设置"""
+    with _lock:
+        return {'applied': dict(_applied), 'failures': list(_failures)}
+
+
+def print_report():
+    report = tuning_report()
+    for role, count in report['applied'].items():
+        print(f"[{role}] 已设置 {count} 个线程")
+    for role, setting, error in report['failures']:
+        print(f"[{role}] {setting} 未生效: {error}")
+
+
+def _busy_loop(stop, role):
+    """制造CPU负载的进程"""
+    if role:
+        apply_role(role)
+    x = 0
+    while not stop.is_set():
+        for _ in range(100000):
+            x += 1
+
+
+def measure_jitter(device, seconds, load, tuned):
+    """读取一台相机, 返回相邻两帧到达的时间间隔(毫秒); load为同时运行的满负载进程数"""
+    from capture_backend import open_capture
+
+    stop = multiprocessing.Event()
+    # 负载进程按编码线程放置, 与实际运行时相同
+    workers = [multiprocessing.Process(target=_busy_loop, args=(stop, 'encode' if tuned else None), daemon=True)
+               for _ in range(load)]
+    for worker in workers:
+        worker.start()
+
+    intervals = []
+
+    def capture():
+        if tuned:
+            apply_role('capture')
+        cap = open_capture(device)
+        if not cap.isOpened():
+            print(f"无法打开相机 {device}")
+            return
+        for _ in range(10):
+            cap.read()
+        last = None
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            ret, _ = cap.read()
+            now = time.monotonic()
+            if ret and last is not None:
+                intervals.append((now - last) * 1000)
+            last = now if ret else None
+        cap.release()
+
+    thread = threading.Thread(target=capture)
+    thread.start()
+    thread.join()
+    stop.set()
+    for worker in workers:
+        worker.join()
+    return intervals
+
+
+def summarize(intervals):
+    from timelapse import percentile
+    if not intervals:
+        return {}
+    mean = sum(intervals) / len(intervals)
+    return {
+        'frames': len(intervals) + 1,
+        'mean_ms': mean,
+        'std_ms': (sum((x - mean) ** 2 for x in intervals) / len(intervals)) ** 0.5,
+        'p50_ms': percentile(intervals, 50),
+        'p99_ms': percentile(intervals, 99),
+        'max_ms': max(intervals),
+    }
+
+
+def histogram(intervals, bins=12, width=40):
+    """文本直方图"""
+    low, high = min(intervals), max(intervals)
+    step = (high - low) / bins or 1.0
+    counts = [0] * bins
+    for x in intervals:
+        counts[min(bins - 1, int((x - low) / step))] += 1
+    peak = max(counts)
+    for i, count in enumerate(counts):
+        print(f"  {low + i * step:7.2f} ms | {'#' * round(count / peak * width):<{width}} {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较线程绑核/实时调度前后的帧间隔抖动")
+    parser.add_argument("device", help="相机设备")
+    parser.add_argument("--seconds", type=float, default=20.0)
+    parser.add_argument("--load", type=int, default=os.cpu_count() or 1, help="同时运行的满负载进程数")
+    parser.add_argument("--config", default=THREAD_CONFIG)
+    args = parser.parse_args()
+
+    config = load_thread_config(args.config)
+    if not config:
+        print(f"没有找到线程配置 {args.config}, 只测量默认情况")
+    configure(config)
+
+    runs = [("默认", False)] + ([("绑核/调度", True)] if config else [])
+    for title, tuned in runs:
+        intervals = measure_jitter(args.device, args.seconds, args.load, tuned)
+        stats = summarize(intervals)
+        if not stats:
+            print(f"{title}: 没有读到图像")
+            continue
+        print(f"{title}: {stats['frames']} 帧, 间隔 平均 {stats['mean_ms']:.2f} ms, "
+              f"标准差 {stats['std_ms']:.2f} ms, p50 {stats['p50_ms']:.2f} ms, "
+              f"p99 {stats['p99_ms']:.2f} ms, 最大 {stats['max_ms']:.2f} ms")
+        histogram(intervals)
+    print_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import time
+import argparse
+import threading
+from capture_engine import CaptureEngine
+from save_pipeline import SavePipeline, make_timestamp
+from capture_archive import ArchiveWriter, session_path
+from catalog import CaptureCatalog
+from encoders import get_encoder, available_encoders
+from frame_budget import default_budget, format_usage
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class TimelapseScheduler:
+    """按单调时钟的固定节拍触发拍摄, 节拍只由起始时间和序号决定, 不会累积漂移
+
+    policy:
+      'skip'    错过的节拍直接跳过, 下一次在下一个节拍点拍摄
+      'catchup' 错过的节拍立即补拍, 最多连续补拍 max_catchup 次
+    """
+
+    def __init__(self, interval, capture_fn, policy='skip', max_catchup=3, count=None):
+        self.interval = interval
+        self.capture_fn = capture_fn  # capture_fn(序号, 计划时间)
+        self.policy = policy
+        self.max_catchup = max_catchup
+        self.count = count
+        self.stop_event = threading.Event()
+        self.lateness = []   # 实际触发时间 - 计划时间
+        self.triggers = []   # 实际触发时间
+        self.skipped = 0
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        start = time.monotonic()
+        index = 0
+        catchup = 0
+        while not self.stop_event.is_set():
+            if self.count is not None and len(self.triggers) >= self.count:
+                break
+            target = start + index * self.interval
+            delay = target - time.monotonic()
+            if delay > 0 and self.stop_event.wait(delay):
+                break
+
+            now = time.monotonic()
+            late = now - target
+            if late >= self.interval:
+                if self.policy == 'skip' or catchup >= self.max_catchup:
+                    missed = int(late // self.interval)
+                    self.skipped += missed
+                    index += missed
+                    catchup = 0
+                    continue
+                catchup += 1
+            else:
+                catchup = 0
+
+            self.lateness.append(late)
+            self.triggers.append(now)
+            self.capture_fn(index, target)
+            index += 1
+
+    def stats(self):
+        """节拍误差统计(毫秒)"""
+        lateness = [x * 1000 for x in self.lateness]
+        intervals = [(b - a) * 1000 for a, b in zip(self.triggers, self.triggers[1:])]
+        jitter = [abs(x - self.interval * 1000) for x in intervals]
+        return {
+            'captures': len(self.triggers),
+            'skipped': self.skipped,
+            'lateness_mean_ms': sum(lateness) / len(lateness) if lateness else 0.0,
+            'lateness_p99_ms': percentile(lateness, 99),
+            'lateness_max_ms': max(lateness) if lateness else 0.0,
+            'interval_mean_ms': sum(intervals) / len(intervals) if intervals else 0.0,
+            'jitter_p50_ms': percentile(jitter, 50),
+            'jitter_p99_ms': percentile(jitter, 99),
+        }
+
+
+def print_stats(stats):
+    print(f"已拍摄 {stats['captures']} 组, 跳过 {stats['skipped']} 个节拍; "
+          f"平均间隔 {stats['interval_mean_ms']:.2f} ms, "
+          f"抖动 p50 {stats['jitter_p50_ms']:.2f} ms / p99 {stats['jitter_p99_ms']:.2f} ms, "
+          f"最大延迟 {stats['lateness_max_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多相机定时拍摄")
+    parser.add_argument("--interval", type=float, required=True, help="拍摄间隔(秒), 可小于1")
+    parser.add_argument("--count", type=int, help="拍摄组数, 不指定则一直运行")
+    parser.add_argument("--policy", choices=["skip", "catchup"], default="skip")
+    parser.add_argument("--out", default=".")
+    parser.add_argument("--archive", action="store_true", help="写入分片文件而不是单独的jpg")
+    parser.add_argument("--format", choices=available_encoders(), default="jpeg", help="保存格式")
+    parser.add_argument("--max-pending", type=int, default=4,
+                        help="排队等待写盘的组数上限, 超过时放弃保存以保证节拍")
+    args = parser.parse_args()
+
+    engine = CaptureEngine()
+    engine.start()
+    archive = ArchiveWriter(session_path(args.out)) if args.archive else None
+    pipeline = SavePipeline(args.out, archive=archive, catalog=CaptureCatalog(),
+                            encoder=get_encoder(args.format), budget=default_budget())
+    pending = []
+    dropped = [0]
+
+    def capture(index, target):
+        frames, metadata = engine.capture_set(trigger=target, timeout=min(1.0, args.interval))
+        metadata['sequence'] = index
+        # 写盘跟不上时丢弃这一组而不是阻塞节拍
+        pending[:] = [f for f in pending if not f.done()]
+        if len(pending) >= args.max_pending:
+            dropped[0] += 1
+            return
+        # 文件名总是带序号: 间隔小于1秒, 或catchup策略连续补拍错过的组时, 同一秒内会有多组
+        timestamp = f"{make_timestamp()}_{index:06d}"
+        # 超出内存预算时立即放弃, 不在调度线程中等待
+        pending.append(pipeline.submit_set(frames, timestamp, metadata=metadata, budget_timeout=0))
+        if index % 10 == 0:
+            print_stats(scheduler.stats())
+
+    scheduler = TimelapseScheduler(args.interval, capture, args.policy, count=args.count)
+    # 等所有相机出第一帧后再开始计时
+    engine.capture_set(timeout=5.0)
+    print(f"开始定时拍摄, 间隔 {args.interval} 秒, 按 Ctrl+C 结束")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        pipeline.close()
+        print_stats(scheduler.stats())
+        print(format_usage(default_budget().usage()))
+        if dropped[0]:
+            print(f"因写盘跟不上放弃保存 {dropped[0]} 组")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import json
+import hashlib
+import cv2
+import numpy as np
+
+# 每台相机一个标定文件: calibration/<设备名>.json
+# {"camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]],
+#  "dist_coeffs": [k1, k2, p1, p2, k3], "image_size": [1280, 720], "alpha": 0.0}
+CALIBRATION_DIR = "calibration"
+MAP_CACHE_DIR = os.path.join(CALIBRATION_DIR, "cache")
+
+
+def load_profile(name, calib_dir=CALIBRATION_DIR):
+    """读取相机标定参数, 不存在时返回None"""
+    path = os.path.join(calib_dir, f"{name}.json")
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"读取标定文件失败 {path}: {e}")
+        return None
+
+
+class Undistorter:
+    """按分辨率缓存去畸变映射表, 采集线程中直接remap"""
+
+    def __init__(self, name, profile, cache_dir=MAP_CACHE_DIR):
+        self.name = name
+        self.camera_matrix = np.array(profile["camera_matrix"], dtype=np.float64)
+        self.dist_coeffs = np.array(profile["dist_coeffs"], dtype=np.float64)
+        self.calib_size = tuple(profile["image_size"])
+        self.alpha = profile.get("alpha", 0.0)
+        self.cache_dir = cache_dir
+        self.profile_hash = hashlib.sha1(
+            json.dumps(profile, sort_keys=True).encode()).hexdigest()[:10]
+        self.maps = {}
+
+    def _scaled_matrix(self, size):
+        """标定分辨率与当前分辨率不同时缩放内参"""
+        sx = size[0] / self.calib_size[0]
+        sy = size[1] / self.calib_size[1]
+        matrix = self.camera_matrix.copy()
+        matrix[0, :] *= sx
+        matrix[1, :] *= sy
+        return matrix
+
+    def _cache_path(self, size):
+        return os.path.join(self.cache_dir,
+                            f"{self.name}_{size[0]}x{size[1]}_{self.profile_hash}.npz")
+
+    def get_maps(self, size):
+        """获取 (map1, map2), 依次查内存缓存、磁盘缓存, 都没有时才重新计算"""
+        maps = self.maps.get(size)
+        if maps is not None:
+            return maps
+
+        path = self._cache_path(size)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                maps = (data["map1"], data["map2"])
+        else:
+            matrix = self._scaled_matrix(size)
+            new_matrix, _ = cv2.getOptimalNewCameraMatrix(
+                matrix, self.dist_coeffs, size, self.alpha, size)
+            # CV_16SC2 定点格式: 比float32映射小一半, remap也更快
+            maps = cv2.initUndistortRectifyMap(
+                matrix, self.dist_coeffs, None, new_matrix, size, cv2.CV_16SC2)
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(path, map1=maps[0], map2=maps[1])
+            except OSError as e:
+                print(f"保存映射表缓存失败 {path}: {e}")
+
+        self.maps[size] = maps
+        return maps
+
+    def apply(self, frame):
+        """对一帧做去畸变"""
+        h, w = frame.shape[:2]
+        map1, map2 = self.get_maps((w, h))
+        return cv2.remap(frame, map1, map2, cv2.INTER_LINEAR)
+
+
+def load_undistorter(device_path, calib_dir=CALIBRATION_DIR):
+    """根据设备名加载去畸变器, 没有标定文件时返回None"""
+    name = device_path.split('/')[-1]
+    profile = load_profile(name, calib_dir)
+    if profile is None:
+        return None
+    return Undistorter(name, profile, os.path.join(calib_dir, "cache"))
@@ -0,0 +1,417 @@
+import os
+import mmap
+import fcntl
+import errno
+import select
+import ctypes
+import cv2
+import numpy as np
+
+# 直接通过V4L2 ioctl读取相机(mmap缓冲区), 接口与cv2.VideoCapture相同,
+# 另外提供 stream_off()/stream_on(): 暂停时停止数据流但保持设备打开、格式和缓冲区不变,
+# 恢复时只需重新开始数据流, 不用重新打开设备和协商分辨率
+
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_MEMORY_MMAP = 1
+V4L2_FIELD_ANY = 0
+V4L2_CAP_VIDEO_CAPTURE = 0x00000001
+V4L2_CAP_STREAMING = 0x04000000
+V4L2_CAP_DEVICE_CAPS = 0x80000000
+
+V4L2_CID_AUTO_WHITE_BALANCE = 0x0098090c
+V4L2_CID_EXPOSURE_AUTO = 0x009a0901
+V4L2_CID_EXPOSURE_ABSOLUTE = 0x009a0902
+
+PIX_FMT_YUYV = cv2.VideoWriter_fourcc(*'YUYV')
+PIX_FMT_MJPG = cv2.VideoWriter_fourcc(*'MJPG')
+
+DEFAULT_BUFFERS = 4
+READ_TIMEOUT = 2.0
+
+
+class v4l2_capability(ctypes.Structure):
+    _fields_ = [
+        ('driver', ctypes.c_char * 16),
+        ('card', ctypes.c_char * 32),
+        ('bus_info', ctypes.c_char * 32),
+        ('version', ctypes.c_uint32),
+        ('capabilities', ctypes.c_uint32),
+        ('device_caps', ctypes.c_uint32),
+        ('reserved', ctypes.c_uint32 * 3),
+    ]
+
+
+class v4l2_pix_format(ctypes.Structure):
+    _fields_ = [
+        ('width', ctypes.c_uint32),
+        ('height', ctypes.c_uint32),
+        ('pixelformat', ctypes.c_uint32),
+        ('field', ctypes.c_uint32),
+        ('bytesperline', ctypes.c_uint32),
+        ('sizeimage', ctypes.c_uint32),
+        ('colorspace', ctypes.c_uint32),
+        ('priv', ctypes.c_uint32),
+        ('flags', ctypes.c_uint32),
+        ('ycbcr_enc', ctypes.c_uint32),
+        ('quantization', ctypes.c_uint32),
+        ('xfer_func', ctypes.c_uint32),
+    ]
+
+
+class _format_union(ctypes.Union):
+    # 内核中的联合体包含指针(v4l2_window), 按8字节对齐
+    _fields_ = [
+        ('pix', v4l2_pix_format),
+        ('raw_data', ctypes.c_uint8 * 200),
+        ('_align', ctypes.c_void_p),
+    ]
+
+
+class v4l2_format(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('fmt', _format_union),
+    ]
+
+
+class v4l2_requestbuffers(ctypes.Structure):
+    _fields_ = [
+        ('count', ctypes.c_uint32),
+        ('type', ctypes.c_uint32),
+        ('memory', ctypes.c_uint32),
+        ('capabilities', ctypes.c_uint32),
+        ('flags', ctypes.c_uint8),
+        ('reserved', ctypes.c_uint8 * 3),
+    ]
+
+
+class timeval(ctypes.Structure):
+    _fields_ = [('tv_sec', ctypes.c_long), ('tv_usec', ctypes.c_long)]
+
+
+class v4l2_timecode(ctypes.Structure):
+    _fields_ = [
+        ('type', ctypes.c_uint32),
+        ('flags', ctypes.c_uint32),
+        ('frames', ctypes.c_uint8),
+        ('seconds', ctypes.c_uint8),
+        ('minutes', ctypes.c_uint8),
+        ('hours', ctypes.c_uint8),
+        ('userbits', ctypes.c_uint8 * 4),
+    ]
+
+
+class _buffer_m(ctypes.Union):
+    _fields_ = [
+        ('offset', ctypes.c_uint32),
+        ('userptr', ctypes.c_ulong),
+        ('planes', ctypes.c_void_p),
+        ('fd', ctypes.c_int32),
+    ]
+
+
+class v4l2_buffer(ctypes.Structure):
+    _fields_ = [
+        ('index', ctypes.c_uint32),
+        ('type', ctypes.c_uint32),
+        ('bytesused', ctypes.c_uint32),
+        ('flags', ctypes.c_uint32),
+        ('field', ctypes.c_uint32),
+        ('timestamp', timeval),
+        ('timecode', v4l2_timecode),
+        ('sequence', ctypes.c_uint32),
+        ('memory', ctypes.c_uint32),
+        ('m', _buffer_m),
+        ('length', ctypes.c_uint32),
+        ('reserved2', ctypes.c_uint32),
+        ('request_fd', ctypes.c_int32),
+    ]
+
+
+class v4l2_fract(ctypes.Structure):
+    _fields_ = [('numerator', ctypes.c_uint32), ('denominator', ctypes.c_uint32)]
+
+
+class v4l2_captureparm(ctypes.Structure):
+    _fields_ = [
+        ('capability', ctypes.c_uint32),
+        ('capturemode', ctypes.c_uint32),
+        ('timeperframe', v4l2_fract),
+        ('extendedmode', ctypes.c_uint32),
+        ('readbuffers', ctypes.c_uint32),
+        ('reserved', ctypes.c_uint32 * 4),
+    ]
+
+
+class _parm_union(ctypes.Union):
+    _fields_ = [('capture', v4l2_captureparm), ('raw_data', ctypes.c_uint8 * 200)]
+
+
+class v4l2_streamparm(ctypes.Structure):
+    _fields_ = [('type', ctypes.c_uint32), ('parm', _parm_union)]
+
+
+class v4l2_control(ctypes.Structure):
+    _fields_ = [('id', ctypes.c_uint32), ('value', ctypes.c_int32)]
+
+
+def _ioc(direction, nr, struct_type):
+    return (direction << 30) | (ctypes.sizeof(struct_type) << 16) | (ord('V') << 8) | nr
+
+
+_IOW, _IOR, _IOWR = 1, 2, 3
+VIDIOC_QUERYCAP = _ioc(_IOR, 0, v4l2_capability)
+VIDIOC_G_FMT = _ioc(_IOWR, 4, v4l2_format)
+VIDIOC_S_FMT = _ioc(_IOWR, 5, v4l2_format)
+VIDIOC_REQBUFS = _ioc(_IOWR, 8, v4l2_requestbuffers)
+VIDIOC_QUERYBUF = _ioc(_IOWR, 9, v4l2_buffer)
+VIDIOC_QBUF = _ioc(_IOWR, 15, v4l2_buffer)
+VIDIOC_DQBUF = _ioc(_IOWR, 17, v4l2_buffer)
+VIDIOC_STREAMON = _ioc(_IOW, 18, ctypes.c_int)
+VIDIOC_STREAMOFF = _ioc(_IOW, 19, ctypes.c_int)
+VIDIOC_G_PARM = _ioc(_IOWR, 21, v4l2_streamparm)
+VIDIOC_S_PARM = _ioc(_IOWR, 22, v4l2_streamparm)
+VIDIOC_G_CTRL = _ioc(_IOWR, 27, v4l2_control)
+VIDIOC_S_CTRL = _ioc(_IOWR, 28, v4l2_control)
+
+# cv2属性 -> V4L2控制项
+CONTROLS = {
+    cv2.CAP_PROP_AUTO_EXPOSURE: V4L2_CID_EXPOSURE_AUTO,
+    cv2.CAP_PROP_EXPOSURE: V4L2_CID_EXPOSURE_ABSOLUTE,
+    cv2.CAP_PROP_AUTO_WB: V4L2_CID_AUTO_WHITE_BALANCE,
+}
+
+
+class V4L2Capture:
+    """用V4L2 mmap流式读取一台相机, 支持保持配置的暂停(stream_off)和快速恢复(stream_on)"""
+
+    def __init__(self, device_path, buffer_count=DEFAULT_BUFFERS):
+        self.device_path = device_path
+        self.buffer_count = buffer_count
+        self.fd = None
+        self.buffers = []       # mmap对象
+        self.streaming = False
+        self.raw = None         # grab()取到的原始数据, retrieve()时才解码
+        self.timestamp = 0.0    # 最近一帧的驱动时间戳(秒, CLOCK_MONOTONIC)
+        self.sequence = 0
+        try:
+            self.fd = os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+            cap = v4l2_capability()
+            fcntl.ioctl(self.fd, VIDIOC_QUERYCAP, cap)
+            caps = cap.device_caps if cap.capabilities & V4L2_CAP_DEVICE_CAPS else cap.capabilities
+            if not caps & V4L2_CAP_VIDEO_CAPTURE or not caps & V4L2_CAP_STREAMING:
+                raise OSError(errno.ENOTSUP, "设备不支持视频采集流")
+            self.format = self._get_format()
+        except OSError:
+            self.release()
+
+    def isOpened(self):
+        return self.fd is not None
+
+    def fileno(self):
+        return self.fd
+
+    def _get_format(self):
+        fmt = v4l2_format(type=V4L2_BUF_TYPE_VIDEO_CAPTURE)
+        fcntl.ioctl(self.fd, VIDIOC_G_FMT, fmt)
+        return fmt
+
+    def _allocate(self):
+        req = v4l2_requestbuffers(count=self.buffer_count, type=V4L2_BUF_TYPE_VIDEO_CAPTURE,
+                                  memory=V4L2_MEMORY_MMAP)
+        fcntl.ioctl(self.fd, VIDIOC_REQBUFS, req)
+        for index in range(req.count):
+            buf = v4l2_buffer(index=index, type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP)
+            fcntl.ioctl(self.fd, VIDIOC_QUERYBUF, buf)
+            self.buffers.append(mmap.mmap(self.fd, buf.length, mmap.MAP_SHARED,
+                                          mmap.PROT_READ | mmap.PROT_WRITE, offset=buf.m.offset))
+
+    def _free(self):
+        for buffer in self.buffers:
+            buffer.close()
+        self.buffers = []
+        req = v4l2_requestbuffers(count=0, type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP)
+        try:
+            fcntl.ioctl(self.fd, VIDIOC_REQBUFS, req)
+        except OSError:
+            pass
+
+    def stream_on(self):
+        """(重新)开始数据流: 所有缓冲区入队后STREAMON, 第一帧大约一个帧间隔后到达"""
+        if self.fd is None or self.streaming:
+            return self.fd is not None
+        if not self.buffers:
+            self._allocate()
+        for index in range(len(self.buffers)):
+            buf = v4l2_buffer(index=index, type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP)
+            fcntl.ioctl(self.fd, VIDIOC_QBUF, buf)
+        fcntl.ioctl(self.fd, VIDIOC_STREAMON, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        self.streaming = True
+        return True
+
+    def stream_off(self):
+        """停止数据流(USB带宽随之释放), 设备保持打开, 格式和缓冲区保留"""
+        if self.fd is None or not self.streaming:
+            return
+        fcntl.ioctl(self.fd, VIDIOC_STREAMOFF, ctypes.c_int(V4L2_BUF_TYPE_VIDEO_CAPTURE))
+        self.streaming = False
+        self.raw = None
+
+    def _reconfigure(self, apply):
+        """格式或缓冲区数量变化时需要停流并重新分配缓冲区"""
+        was_streaming = self.streaming
+        self.stream_off()
+        self._free()
+        try:
+            apply()
+        finally:
+            self.format = self._get_format()
+            if was_streaming:
+                self.stream_on()
+
+    def grab(self, timeout=READ_TIMEOUT):
+        if self.fd is None:
+            return False
+        try:
+            if not self.streaming:
+                self.stream_on()
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+            if not ready:
+                return False
+            buf = v4l2_buffer(type=V4L2_BUF_TYPE_VIDEO_CAPTURE, memory=V4L2_MEMORY_MMAP)
+            fcntl.ioctl(self.fd, VIDIOC_DQBUF, buf)
+            # 复制出数据后立即把缓冲区还给驱动
+            self.raw = self.buffers[buf.index][:buf.bytesused]
+            self.timestamp = buf.timestamp.tv_sec + buf.timestamp.tv_usec / 1e6
+            self.sequence = buf.sequence
+            fcntl.ioctl(self.fd, VIDIOC_QBUF, buf)
+            return True
+        except OSError:
+            # 设备断开(ENODEV)等错误, 由调用方按读取失败处理
+            return False
+
+    def grab_latest(self):
+        """取队列中最新的一帧: 等到至少一帧后, 把已经就绪的缓冲区全部出队, 只保留最后一帧"""
+        if not self.grab():
+            return False
+        while self.grab(timeout=0):
+            pass
+        return True
+
+    def min_frame_bytes(self):
+        """一帧完整数据至少的字节数; 压缩格式(MJPG)长度不固定, 返回0"""
+        pix = self.format.fmt.pix
+        if pix.pixelformat == PIX_FMT_YUYV:
+            return pix.bytesperline * pix.height
+        return 0
+
+    def decode(self, raw):
+        """把一帧原始数据解码为BGR图像, 不访问设备, 可以在其他线程中调用; 数据不完整时返回None"""
+        pix = self.format.fmt.pix
+        if pix.pixelformat == PIX_FMT_MJPG:
+            return cv2.imdecode(np.frombuffer(raw, np.uint8), cv2.IMREAD_COLOR)
+        if pix.pixelformat == PIX_FMT_YUYV:
+            if len(raw) < self.min_frame_bytes():
+                return None
+            yuyv = np.frombuffer(raw, np.uint8, count=pix.bytesperline * pix.height)
+            yuyv = yuyv.reshape(pix.height, pix.bytesperline // 2, 2)[:, :pix.width]
+            return cv2.cvtColor(yuyv, cv2.COLOR_YUV2BGR_YUYV)
+        return None
+
+    def retrieve(self):
+        if self.raw is None:
+            return False, None
+        frame = self.decode(self.raw)
+        return frame is not None, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set_format(self, width, height, fourcc=None):
+        """一次设置分辨率和像素格式(逐项set会重复协商), 驱动可能改为最接近的支持值"""
+        pix = self.format.fmt.pix
+        fourcc = fourcc or pix.pixelformat
+        if (width, height, fourcc) == (pix.width, pix.height, pix.pixelformat):
+            return
+
+        def apply():
+            fmt = v4l2_format(type=V4L2_BUF_TYPE_VIDEO_CAPTURE)
+            fmt.fmt.pix.width, fmt.fmt.pix.height = width, height
+            fmt.fmt.pix.pixelformat, fmt.fmt.pix.field = fourcc, V4L2_FIELD_ANY
+            fcntl.ioctl(self.fd, VIDIOC_S_FMT, fmt)
+        self._reconfigure(apply)
+
+    def set(self, prop, value):
+        if self.fd is None:
+            return False
+        pix = self.format.fmt.pix
+        try:
+            if prop in (cv2.CAP_PROP_FRAME_WIDTH, cv2.CAP_PROP_FRAME_HEIGHT, cv2.CAP_PROP_FOURCC):
+                width, height, fourcc = pix.width, pix.height, pix.pixelformat
+                if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                    width = int(value)
+                elif prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                    height = int(value)
+                else:
+                    fourcc = int(value)
+                self.set_format(width, height, fourcc)
+                return True
+            if prop == cv2.CAP_PROP_BUFFERSIZE:
+                count = max(1, int(value))
+                if count != self.buffer_count:
+                    def apply():
+                        self.buffer_count = count
+                    self._reconfigure(apply)
+                return True
+            if prop == cv2.CAP_PROP_FPS:
+                parm = v4l2_streamparm(type=V4L2_BUF_TYPE_VIDEO_CAPTURE)
+                parm.parm.capture.timeperframe = v4l2_fract(1000, int(value * 1000))
+                fcntl.ioctl(self.fd, VIDIOC_S_PARM, parm)
+                return True
+            if prop in CONTROLS:
+                fcntl.ioctl(self.fd, VIDIOC_S_CTRL, v4l2_control(CONTROLS[prop], int(value)))
+                return True
+        except OSError:
+            return False
+        return False
+
+    def get(self, prop):
+        if self.fd is None:
+            return 0.0
+        pix = self.format.fmt.pix
+        try:
+            if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                return float(pix.width)
+            if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                return float(pix.height)
+            if prop == cv2.CAP_PROP_FOURCC:
+                return float(pix.pixelformat)
+            if prop == cv2.CAP_PROP_BUFFERSIZE:
+                return float(len(self.buffers) or self.buffer_count)
+            if prop == cv2.CAP_PROP_POS_MSEC:
+                return self.timestamp * 1000
+            if prop == cv2.CAP_PROP_FPS:
+                parm = v4l2_streamparm(type=V4L2_BUF_TYPE_VIDEO_CAPTURE)
+                fcntl.ioctl(self.fd, VIDIOC_G_PARM, parm)
+                tpf = parm.parm.capture.timeperframe
+                return tpf.denominator / tpf.numerator if tpf.numerator else 0.0
+            if prop in CONTROLS:
+                control = v4l2_control(CONTROLS[prop], 0)
+                fcntl.ioctl(self.fd, VIDIOC_G_CTRL, control)
+                return float(control.value)
+        except OSError:
+            pass
+        return 0.0
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            self.stream_off()
+        except OSError:
+            pass
+        self._free()
+        os.close(self.fd)
+        self.fd = None